@@ -1,11 +1,24 @@
 # app.py
 # Streamlit frontend — Fun, Light, Friendly Business UI
 
+import csv
+import io
+import os
+import re
+import time
+
 import streamlit as st
+from dotenv import load_dotenv
+
+# engine.recommender reads its PRICING_* settings on import, so .env goes first.
+load_dotenv()
+
 from engine.elasticity import calculate_elasticity, interpret_elasticity, get_margin
-from engine.competitor import analyze_competitors
-from engine.recommender import get_recommendation
+from engine.competitor import analyze_competitors, competitor_distribution
+from engine.metrics import metrics
+from engine.recommender import stream_recommendation
 
+run_started = time.perf_counter()
 st.set_page_config(page_title="Pricing Intelligence", page_icon="🏷️", layout="wide")
 
 st.markdown("""
@@ -266,6 +279,36 @@ html, body, [class*="css"] {
 .bar-you-label { font-size: 0.72rem; font-weight: 700; color: #fff; }
 .bar-comp-label { font-size: 0.72rem; font-weight: 600; color: #888; }
 
+/* ── Price histogram (large competitor sets) ── */
+.hist {
+    display: flex;
+    align-items: flex-end;
+    gap: 3px;
+    height: 120px;
+    margin-bottom: 0.4rem;
+}
+.hist-bar {
+    flex: 1;
+    background: #e8e4dc;
+    border-radius: 4px 4px 0 0;
+    min-height: 2px;
+}
+.hist-bar.you { background: linear-gradient(180deg, #f57c52, #F25C2B); }
+.hist-axis {
+    display: flex;
+    justify-content: space-between;
+    font-size: 0.68rem;
+    font-weight: 600;
+    color: #aaa;
+    margin-bottom: 0.85rem;
+}
+.hist-bands {
+    font-size: 0.75rem;
+    color: #888;
+    line-height: 1.7;
+}
+.hist-bands b { color: #1a1a1a; }
+
 /* ── Empty state ── */
 .empty-state {
     background: #faf9f6;
@@ -298,114 +341,78 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# ── Initialize ──
-comp1 = comp2 = comp3 = old_price = old_units = 0.0
-
-left, right = st.columns([3, 2], gap="large")
-
-with left:
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown('<div class="section-label"><span class="dot"></span> Product Details</div>', unsafe_allow_html=True)
-    c1, c2 = st.columns(2)
-    with c1:
-        product_name = st.text_input("Product Name", placeholder="e.g. Handmade Soy Candle")
-        your_price = st.number_input("Your Current Price ($)", min_value=0.0, step=0.01)
-    with c2:
-        category = st.selectbox("Category", [
-            "Handmade Goods", "Electronics", "Clothing",
-            "Food & Beverage", "Home & Garden", "Other"
-        ])
-        cost = st.number_input("Cost to Make / Source ($)", min_value=0.0, step=0.01)
-    units_sold = st.number_input("Units Sold Per Month", min_value=0, step=1)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown('<div class="section-label"><span class="dot"></span> Price History — Optional</div>', unsafe_allow_html=True)
-    st.caption("Unlocks demand elasticity — helps the AI understand how price-sensitive your buyers are.")
-    c3, c4 = st.columns(2)
-    with c3:
-        old_price = st.number_input("Previous Price ($)", min_value=0.0, step=0.01)
-    with c4:
-        old_units = st.number_input("Units Sold at That Price", min_value=0, step=1)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown('<div class="section-label"><span class="dot"></span> Competitor Prices</div>', unsafe_allow_html=True)
-    st.caption("Look up what similar products sell for on Etsy, Amazon, or wherever you compete.")
-    c5, c6, c7 = st.columns(3)
-    with c5:
-        comp1 = st.number_input("Competitor 1 ($)", min_value=0.0, step=0.01)
-    with c6:
-        comp2 = st.number_input("Competitor 2 ($)", min_value=0.0, step=0.01)
-    with c7:
-        comp3 = st.number_input("Competitor 3 ($)", min_value=0.0, step=0.01)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown('<div class="section-label"><span class="dot"></span> Your Goal</div>', unsafe_allow_html=True)
-    goal = st.selectbox("What are you optimizing for?", [
-        "Maximize Profit",
-        "Maximize Sales Volume",
-        "Beat Competitors",
-        "Stay Competitive While Protecting Margin"
-    ])
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    st.markdown("<br>", unsafe_allow_html=True)
-    generate = st.button("✦ Generate My Pricing Recommendation")
-
-with right:
-    competitor_prices_live = [p for p in [comp1, comp2, comp3] if p > 0]
-    live_comp = analyze_competitors(your_price, competitor_prices_live) if competitor_prices_live and your_price > 0 else None
-    live_margin = get_margin(your_price, cost) if your_price > 0 and cost > 0 else None
-    live_revenue = round(your_price * units_sold, 2) if your_price > 0 and units_sold > 0 else None
-
-    st.markdown('<div class="section-label"><span class="dot"></span> Live Metrics</div>', unsafe_allow_html=True)
-
-    m1, m2 = st.columns(2)
-    with m1:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-card-label">Profit Margin</div>
-            <div class="metric-card-value highlight">{f"{live_margin}%" if live_margin is not None else "—"}</div>
-            <div class="metric-card-sub">per unit sold</div>
-        </div>""", unsafe_allow_html=True)
-    with m2:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-card-label">Monthly Revenue</div>
-            <div class="metric-card-value">{f"${live_revenue:,}" if live_revenue else "—"}</div>
-            <div class="metric-card-sub">at current price</div>
-        </div>""", unsafe_allow_html=True)
-
-    st.markdown("<br>", unsafe_allow_html=True)
-    m3, m4 = st.columns(2)
-    with m3:
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-card-label">Avg Competitor</div>
-            <div class="metric-card-value">{f"${live_comp['avg_competitor_price']}" if live_comp else "—"}</div>
-            <div class="metric-card-sub">market average</div>
-        </div>""", unsafe_allow_html=True)
-    with m4:
-        pos = live_comp['position'].replace('priced ', '').title() if live_comp else "—"
-        gap = f"{live_comp['price_gap_percent']}%" if live_comp else "—"
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-card-label">Market Position</div>
-            <div class="metric-card-value">{gap}</div>
-            <div class="metric-card-sub">{pos}</div>
-        </div>""", unsafe_allow_html=True)
-
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.markdown('<div class="section-label"><span class="dot"></span> Price Comparison</div>', unsafe_allow_html=True)
-
-    if your_price > 0 and competitor_prices_live:
-        all_prices = [your_price] + competitor_prices_live
-        max_p = max(all_prices)
-        chart = '<div class="chart-container"><div class="chart-title">Your Price vs Competitors</div>'
-        yw = max(12, round((your_price / max_p) * 100))
-        chart += f"""
+# ── Live metrics ──
+# Memoized on their inputs and shared across sessions, so a rerun only
+# recomputes what an edit actually changed.
+@st.cache_data(max_entries=4096, show_spinner=False)
+def live_competitor_stats(your_price, competitor_prices):
+    return analyze_competitors(your_price, list(competitor_prices))
+
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def live_margin_for(your_price, cost):
+    return get_margin(your_price, cost)
+
+
+BAR_CHART_LIMIT = 12    # above this many competitors the chart switches to a histogram
+
+
+# "$1,299" and "1,299.99" are one price; otherwise commas separate prices.
+PRICE_PATTERN = re.compile(r"\$\s*(\d{1,3}(?:,\d{3})+(?:\.\d+)?)|(\d{1,3}(?:,\d{3})+\.\d+)|(\d+(?:\.\d+)?)")
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def parse_competitor_prices(text, file_bytes=None, file_name=""):
+    """
+    Pulls the positive prices out of pasted text and/or an uploaded file.
+    Commas, spaces, semicolons and new lines all separate prices. A CSV
+    upload is read from its one price column: the first column whose header
+    contains "price", or the only column.
+    """
+    found = text_prices(text)
+    if file_bytes:
+        data = file_bytes.decode("utf-8", errors="ignore")
+        found += csv_prices(data) if file_name.lower().endswith(".csv") else text_prices(data)
+    return tuple(found)
+
+
+def text_prices(text):
+    prices = (float("".join(match).replace(",", "")) for match in PRICE_PATTERN.findall(text or ""))
+    return [p for p in prices if p > 0]
+
+
+def csv_prices(data):
+    rows = [row for row in csv.reader(io.StringIO(data)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = next((i for i, name in enumerate(header) if "price" in name), None)
+    if column is not None:
+        rows = rows[1:]
+    elif max(len(row) for row in rows) == 1:
+        column = 0
+    else:
+        return []    # several columns and none named as prices
+    prices = []
+    for row in rows:
+        cell = row[column].strip().lstrip("$").replace(",", "") if len(row) > column else ""
+        try:
+            price = float(cell)
+        except ValueError:
+            continue
+        if price > 0:
+            prices.append(price)
+    return prices
+
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def comparison_chart_html(your_price, competitor_prices):
+    if len(competitor_prices) > BAR_CHART_LIMIT:
+        return distribution_chart_html(your_price, competitor_prices)
+
+    max_p = max(your_price, *competitor_prices)
+    yw = max(12, round((your_price / max_p) * 100))
+    rows = [f"""
         <div class="bar-row">
             <div class="bar-name">YOU</div>
             <div class="bar-track">
@@ -413,10 +420,10 @@ with right:
                     <span class="bar-you-label">${your_price}</span>
                 </div>
             </div>
-        </div>"""
-        for i, cp in enumerate(competitor_prices_live):
-            cw = max(12, round((cp / max_p) * 100))
-            chart += f"""
+        </div>"""]
+    for i, cp in enumerate(competitor_prices):
+        cw = max(12, round((cp / max_p) * 100))
+        rows.append(f"""
             <div class="bar-row">
                 <div class="bar-name">COMP {i+1}</div>
                 <div class="bar-track">
@@ -424,41 +431,214 @@ with right:
                         <span class="bar-comp-label">${cp}</span>
                     </div>
                 </div>
-            </div>"""
-        chart += '</div>'
-        st.markdown(chart, unsafe_allow_html=True)
-    else:
-        st.markdown("""
-        <div class="empty-state">
-            Enter your price + at least<br>
-            one competitor to see the<br>
-            comparison chart 📊
-        </div>""", unsafe_allow_html=True)
-
-# ── Generate ──
-if generate:
-    if not product_name:
-        st.warning("Please enter a product name to continue.")
-    elif your_price == 0:
-        st.warning("Please enter your current price.")
-    elif cost == 0:
-        st.warning("Please enter your production or sourcing cost.")
-    else:
-        with st.spinner("Analyzing your pricing data..."):
-            elasticity = calculate_elasticity(old_price, your_price, old_units, units_sold) if old_price > 0 and old_units > 0 else None
-            elasticity_label = interpret_elasticity(elasticity)
-            margin = get_margin(your_price, cost)
-            competitor_prices = [p for p in [comp1, comp2, comp3] if p > 0]
-            competitor_data = analyze_competitors(your_price, competitor_prices) if competitor_prices else None
-
-            recommendation = get_recommendation(
-                product_name, category, your_price, cost, units_sold,
-                elasticity_label, margin, competitor_data, goal
-            )
-
-        st.markdown(f"""
+            </div>""")
+    return ('<div class="chart-container"><div class="chart-title">Your Price vs Competitors</div>'
+            + "".join(rows) + '</div>')
+
+
+def distribution_chart_html(your_price, competitor_prices):
+    dist = competitor_distribution(your_price, competitor_prices)
+    tallest = max(dist["counts"]) or 1
+    bars = "".join(
+        f'<div class="hist-bar{" you" if i == dist["your_bin"] else ""}" '
+        f'style="height:{max(2, round(count / tallest * 100))}%" title="{count} listings"></div>'
+        for i, count in enumerate(dist["counts"])
+    )
+    return f"""
+        <div class="chart-container">
+            <div class="chart-title">{dist["competitor_count"]:,} Competitor Prices</div>
+            <div class="hist">{bars}</div>
+            <div class="hist-axis"><span>${dist["edges"][0]}</span><span>${dist["edges"][-1]}</span></div>
+            <div class="hist-bands">
+                Middle half of the market: <b>${dist["p25"]} – ${dist["p75"]}</b><br>
+                Median <b>${dist["median"]}</b> · 80% sit between <b>${dist["p10"]} – ${dist["p90"]}</b><br>
+                Your price <b>${your_price}</b> is at or above <b>{dist["your_percentile"]}%</b> of listings
+            </div>
+        </div>"""
+
+
+@st.cache_resource
+def metrics_endpoint():
+    # One /metrics server per process, when PRICING_METRICS_PORT is set.
+    port = os.getenv("PRICING_METRICS_PORT")
+    return metrics.serve(int(port)) if port else None
+
+
+metrics_endpoint()
+
+
+def render_recommendation(text):
+    return f"""
         <div class="rec-container">
             <div class="rec-header">✦ AI Pricing Recommendation</div>
-            <div class="rec-body">{recommendation}</div>
+            <div class="rec-body">{text}</div>
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+
+# ── Workspace ──
+# A fragment: editing an input reruns only this function, not the styles
+# and header above it.
+@st.fragment
+def pricing_workspace():
+    fragment_started = time.perf_counter()
+    left, right = st.columns([3, 2], gap="large")
+
+    with left:
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown('<div class="section-label"><span class="dot"></span> Product Details</div>', unsafe_allow_html=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            product_name = st.text_input("Product Name", placeholder="e.g. Handmade Soy Candle")
+            your_price = st.number_input("Your Current Price ($)", min_value=0.0, step=0.01)
+        with c2:
+            category = st.selectbox("Category", [
+                "Handmade Goods", "Electronics", "Clothing",
+                "Food & Beverage", "Home & Garden", "Other"
+            ])
+            cost = st.number_input("Cost to Make / Source ($)", min_value=0.0, step=0.01)
+        units_sold = st.number_input("Units Sold Per Month", min_value=0, step=1)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown('<div class="section-label"><span class="dot"></span> Price History — Optional</div>', unsafe_allow_html=True)
+        st.caption("Unlocks demand elasticity — helps the AI understand how price-sensitive your buyers are.")
+        c3, c4 = st.columns(2)
+        with c3:
+            old_price = st.number_input("Previous Price ($)", min_value=0.0, step=0.01)
+        with c4:
+            old_units = st.number_input("Units Sold at That Price", min_value=0, step=1)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown('<div class="section-label"><span class="dot"></span> Competitor Prices</div>', unsafe_allow_html=True)
+        st.caption("Look up what similar products sell for on Etsy, Amazon, or wherever you compete. Paste as many as you like.")
+        pasted_prices = st.text_area("Competitor Prices ($)", placeholder="e.g. 18.99, 22.50, 24.00 — or one per line", height=90)
+        uploaded_prices = st.file_uploader("…or upload a CSV / text file of prices", type=["csv", "txt"])
+        competitor_prices_live = parse_competitor_prices(
+            pasted_prices,
+            uploaded_prices.getvalue() if uploaded_prices else None,
+            uploaded_prices.name if uploaded_prices else "",
+        )
+        if competitor_prices_live:
+            st.caption(f"{len(competitor_prices_live):,} competitor prices found.")
+        if uploaded_prices and not parse_competitor_prices("", uploaded_prices.getvalue(), uploaded_prices.name):
+            st.caption("No prices found in the file. For a CSV, give the price column a header with \"price\" in it.")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown('<div class="section-label"><span class="dot"></span> Your Goal</div>', unsafe_allow_html=True)
+        goal = st.selectbox("What are you optimizing for?", [
+            "Maximize Profit",
+            "Maximize Sales Volume",
+            "Beat Competitors",
+            "Stay Competitive While Protecting Margin"
+        ])
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        generate = st.button("✦ Generate My Pricing Recommendation")
+
+    with right:
+        live_comp = live_competitor_stats(your_price, competitor_prices_live) if competitor_prices_live and your_price > 0 else None
+        live_margin = live_margin_for(your_price, cost) if your_price > 0 and cost > 0 else None
+        live_revenue = round(your_price * units_sold, 2) if your_price > 0 and units_sold > 0 else None
+
+        st.markdown('<div class="section-label"><span class="dot"></span> Live Metrics</div>', unsafe_allow_html=True)
+
+        m1, m2 = st.columns(2)
+        with m1:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-card-label">Profit Margin</div>
+                <div class="metric-card-value highlight">{f"{live_margin}%" if live_margin is not None else "—"}</div>
+                <div class="metric-card-sub">per unit sold</div>
+            </div>""", unsafe_allow_html=True)
+        with m2:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-card-label">Monthly Revenue</div>
+                <div class="metric-card-value">{f"${live_revenue:,}" if live_revenue else "—"}</div>
+                <div class="metric-card-sub">at current price</div>
+            </div>""", unsafe_allow_html=True)
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        m3, m4 = st.columns(2)
+        with m3:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-card-label">Avg Competitor</div>
+                <div class="metric-card-value">{f"${live_comp['avg_competitor_price']}" if live_comp else "—"}</div>
+                <div class="metric-card-sub">market average</div>
+            </div>""", unsafe_allow_html=True)
+        with m4:
+            pos = live_comp['position'].replace('priced ', '').title() if live_comp else "—"
+            gap = f"{live_comp['price_gap_percent']}%" if live_comp else "—"
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-card-label">Market Position</div>
+                <div class="metric-card-value">{gap}</div>
+                <div class="metric-card-sub">{pos}</div>
+            </div>""", unsafe_allow_html=True)
+
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown('<div class="section-label"><span class="dot"></span> Price Comparison</div>', unsafe_allow_html=True)
+
+        if your_price > 0 and competitor_prices_live:
+            st.markdown(comparison_chart_html(your_price, competitor_prices_live), unsafe_allow_html=True)
+        else:
+            st.markdown("""
+            <div class="empty-state">
+                Enter your price + at least<br>
+                one competitor to see the<br>
+                comparison chart 📊
+            </div>""", unsafe_allow_html=True)
+
+    # ── Generate ──
+    if generate:
+        with metrics.span("validate_inputs"):
+            if not product_name:
+                problem = "Please enter a product name to continue."
+            elif your_price == 0:
+                problem = "Please enter your current price."
+            elif cost == 0:
+                problem = "Please enter your production or sourcing cost."
+            else:
+                problem = None
+
+        if problem:
+            st.warning(problem)
+        else:
+            generate_started = time.perf_counter()
+            with st.spinner("Analyzing your pricing data..."):
+                with metrics.span("elasticity"):
+                    elasticity = calculate_elasticity(old_price, your_price, old_units, units_sold) if old_price > 0 and old_units > 0 else None
+                    elasticity_label = interpret_elasticity(elasticity)
+                    margin = live_margin_for(your_price, cost)
+                with metrics.span("competitors"):
+                    competitor_data = live_competitor_stats(your_price, competitor_prices_live) if competitor_prices_live else None
+
+                tokens = stream_recommendation(
+                    product_name, category, your_price, cost, units_sold,
+                    elasticity_label, margin, competitor_data, goal
+                )
+                # Hold the spinner only until the first token arrives.
+                recommendation = next(tokens, "")
+
+            rec_card = st.empty()
+            rec_card.markdown(render_recommendation(recommendation + " ▍"), unsafe_allow_html=True)
+            for token in tokens:
+                recommendation += token
+                rec_card.markdown(render_recommendation(recommendation + " ▍"), unsafe_allow_html=True)
+            rec_card.markdown(render_recommendation(recommendation), unsafe_allow_html=True)
+
+            metrics.observe("generate_total", time.perf_counter() - generate_started)
+            if os.getenv("PRICING_METRICS_FILE"):
+                metrics.write(os.environ["PRICING_METRICS_FILE"])
+
+    # Server time of this rerun, read by benchmarks/app_rerun.py.
+    st.session_state["fragment_ms"] = (time.perf_counter() - fragment_started) * 1000
+
+
+pricing_workspace()
+st.session_state["script_ms"] = (time.perf_counter() - run_started) * 1000
@@ -0,0 +1,52 @@
+# benchmarks/app_rerun.py
+# Measures server-side time of a Streamlit rerun after editing one input
+
+import functools
+import json
+import os
+import statistics
+
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app.py")
+
+
+def time_reruns(fragment_only, edits=50):
+    """
+    Loads the app, changes the price input `edits` times and returns the
+    median and p95 server time per rerun in milliseconds, as recorded by the
+    app itself. AppTest always reruns the whole script, so for fragment_only
+    the rerun request is scoped to the workspace fragment the way the
+    browser scopes it when a widget inside the fragment changes.
+    """
+    app = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    metric = "script_ms"
+    if fragment_only:
+        fragment_ids = list(app._fragment_storage._fragments)
+        local_script_runner.RerunData = functools.partial(RerunData, fragment_id_queue=fragment_ids)
+        metric = "fragment_ms"
+
+    price = app.number_input[0]
+    samples = []
+    try:
+        for i in range(edits):
+            price.set_value(10.0 + i % 7)
+            app.run()
+            samples.append(app.session_state[metric])
+    finally:
+        local_script_runner.RerunData = RerunData
+
+    samples.sort()
+    return {
+        "rerun": "fragment" if fragment_only else "full script",
+        "edits": edits,
+        "median_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(time_reruns(fragment_only=False)))
+    print(json.dumps(time_reruns(fragment_only=True)))
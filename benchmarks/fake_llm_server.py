@@ -0,0 +1,322 @@
+# benchmarks/fake_llm_server.py
+# Local OpenAI-compatible stand-in so benchmarks run offline
+#
+#   python benchmarks/fake_llm_server.py --port 8765 --latency 0.4 --tokens-per-second 80
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run app.py
+
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Raise your price to $24.99 (a good range is $23.99–$25.99). "
+    "Your buyers are not very price sensitive and you sit below the market average, "
+    "so a modest increase should lift profit without hurting sales much. "
+    "Risk to watch: a competitor discount could make the gap look bigger than it is."
+)
+
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+
+class FakeLLMServer:
+    """
+    Serves /v1/chat/completions (streaming and not) from a background thread.
+    Each reply waits `latency` seconds for the first token, then emits
+    `completion_tokens` tokens at `tokens_per_second`. Usage is reported with
+    a 4-characters-per-token estimate of the prompt. Requests with a
+    json_schema response_format (batched prompts) get one recommendation per
+    row of the prompt's product table.
+
+    Prompt caching works like the real API: prompts of at least 1024 tokens
+    report the longest previously seen prefix, in 128-token steps, as
+    prompt_tokens_details.cached_tokens.
+
+    With `rpm` and/or `tpm` set, requests are checked against per-minute
+    token buckets like the real API's: each request costs its prompt estimate
+    plus max_tokens, every reply carries x-ratelimit-* headers, and requests
+    over the limit get a 429 with retry-after-ms.
+
+    `outlier_rate` of requests (chosen at random) stall for `outlier_latency`
+    seconds instead of `latency`, to exercise tail-latency handling.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, tokens_per_second=0.0,
+                 completion_tokens=60, rpm=None, tpm=None, outlier_rate=0.0, outlier_latency=2.0,
+                 seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.rpm = rpm
+        self.tpm = tpm
+        self.outlier_rate = outlier_rate
+        self.outlier_latency = outlier_latency
+        self.requests = 0
+        self.rate_limited = 0
+        self.outliers = 0
+        self._random = random.Random(seed)
+        self._budget = {"requests": float(rpm or 0), "tokens": float(tpm or 0), "at": time.monotonic()}
+        self.connections = 0    # TCP connections accepted; fewer than requests means keep-alive reuse
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def reply_tokens(self, max_tokens):
+        words = REPLY.split(" ")
+        count = min(self.completion_tokens, max_tokens or self.completion_tokens)
+        return [words[i % len(words)] + " " for i in range(count)]
+
+    def admit(self, tokens):
+        """
+        Charges one request of `tokens` against the limits.
+        Returns (allowed, rate limit headers).
+        """
+        if not (self.rpm or self.tpm):
+            return True, {}
+        with self._lock:
+            budget = self._budget
+            now = time.monotonic()
+            elapsed, budget["at"] = now - budget["at"], now
+            if self.rpm:
+                budget["requests"] = min(self.rpm, budget["requests"] + elapsed * self.rpm / 60)
+            if self.tpm:
+                budget["tokens"] = min(self.tpm, budget["tokens"] + elapsed * self.tpm / 60)
+
+            waits = []
+            if self.rpm and budget["requests"] < 1:
+                waits.append((1 - budget["requests"]) * 60 / self.rpm)
+            if self.tpm and budget["tokens"] < tokens:
+                waits.append((tokens - budget["tokens"]) * 60 / self.tpm)
+            if waits:
+                self.rate_limited += 1
+            else:
+                budget["requests"] -= 1
+                budget["tokens"] -= tokens
+
+            headers = {}
+            if self.rpm:
+                headers["x-ratelimit-limit-requests"] = str(self.rpm)
+                headers["x-ratelimit-remaining-requests"] = str(max(0, int(budget["requests"])))
+                headers["x-ratelimit-reset-requests"] = f"{(self.rpm - budget['requests']) * 60 / self.rpm:.3f}s"
+            if self.tpm:
+                headers["x-ratelimit-limit-tokens"] = str(self.tpm)
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, int(budget["tokens"])))
+                headers["x-ratelimit-reset-tokens"] = f"{(self.tpm - budget['tokens']) * 60 / self.tpm:.3f}s"
+            if waits:
+                headers["retry-after-ms"] = str(round(max(waits) * 1000))
+            return not waits, headers
+
+    def cached_tokens(self, prompt):
+        hit = 0
+        with self._lock:
+            for end in range(CACHE_MIN_TOKENS * 4, len(prompt) + 1, CACHE_STEP_TOKENS * 4):
+                prefix = hash(prompt[:end])
+                if prefix in self._prefixes:
+                    hit = end // 4
+                self._prefixes.add(prefix)
+        return hit
+
+    def batch_reply(self, prompt):
+        lines = prompt.splitlines()
+        header = next((i for i, line in enumerate(lines) if line.startswith("id|")), len(lines))
+        items = []
+        for line in lines[header + 1:]:
+            cells = line.split("|")
+            if len(cells) < 4:
+                continue
+            price = float(cells[3])
+            items.append({
+                "id": cells[0],
+                "action": "raise",
+                "suggested_price": round(price * 1.05, 2),
+                "price_low": round(price * 1.02, 2),
+                "price_high": round(price * 1.08, 2),
+                "reason": "Buyers are not very price sensitive, so a small increase should lift profit.",
+                "risk": "A competitor discount could make the gap look bigger than it is.",
+            })
+        return json.dumps({"recommendations": items})
+
+    def first_token_delay(self):
+        with self._lock:
+            outlier = self._random.random() < self.outlier_rate
+            self.outliers += outlier
+        return self.outlier_latency if outlier else self.latency
+
+    def token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-reply (cancelled or hedged calls) are expected.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"    # keep-alive, like the real API
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without this,
+            # Nagle + delayed ACK adds ~40 ms to every reply.
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server.count_connection()
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            server.count_request()
+            prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+            prompt_chars = len(prompt)
+            allowed, limit_headers = server.admit(
+                prompt_chars // 4 + (body.get("max_tokens") or server.completion_tokens)
+            )
+            if not allowed:
+                self._send_json(429, {"error": {
+                    "message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded",
+                }}, limit_headers)
+                return
+            if (body.get("response_format") or {}).get("type") == "json_schema":
+                reply = server.batch_reply(body["messages"][-1]["content"])
+                tokens = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+            else:
+                tokens = server.reply_tokens(body.get("max_tokens"))
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_chars // 4 + len(tokens),
+                "prompt_tokens_details": {"cached_tokens": server.cached_tokens(prompt)},
+            }
+            model = body.get("model", "fake")
+
+            time.sleep(server.first_token_delay())
+            if body.get("stream"):
+                self._stream(model, tokens, usage, body, limit_headers)
+                return
+
+            time.sleep(server.token_delay() * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }, limit_headers)
+
+        def _stream(self, model, tokens, usage, body, headers):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            def chunk(delta, finish_reason=None, chunk_usage=None):
+                event = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    if delta is not None else [],
+                }
+                if chunk_usage:
+                    event["usage"] = chunk_usage
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+            for token in tokens:
+                chunk({"content": token})
+                time.sleep(server.token_delay())
+            chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk(None, chunk_usage=usage)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--rpm", type=int, help="emulated requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, help="emulated tokens-per-minute limit")
+    parser.add_argument("--outlier-rate", type=float, default=0.0, help="share of requests that stall")
+    parser.add_argument("--outlier-latency", type=float, default=2.0, help="seconds a stalled request takes")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.tokens_per_second,
+                           args.completion_tokens, args.rpm, args.tpm, args.outlier_rate,
+                           args.outlier_latency)
+    print(f"Fake OpenAI server on {server.base_url}")
+    server._httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
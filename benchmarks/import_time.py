@@ -0,0 +1,42 @@
+# benchmarks/import_time.py
+# Measures cold import time of the engine modules in fresh interpreters
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["engine.elasticity", "engine.competitor", "engine.cache", "engine.recommender"]
+
+
+def time_import(module, runs=5):
+    """
+    Imports `module` in a new Python process `runs` times and returns
+    the median wall time in milliseconds, plus the heavy packages it pulled in.
+    """
+    script = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        "heavy = [m for m in ('openai', 'streamlit', 'httpx', 'pandas', 'numpy') if m in sys.modules]\n"
+        "print(json.dumps({'ms': elapsed, 'heavy': heavy}))\n"
+    )
+    # Older versions built the OpenAI client at import, which needs a key.
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-benchmark"))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                                text=True, check=True, env=env).stdout
+        samples.append(json.loads(output))
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(s["ms"] for s in samples), 1),
+        "heavy_imports": samples[-1]["heavy"],
+    }
+
+
+if __name__ == "__main__":
+    for module in MODULES:
+        print(json.dumps(time_import(module)))
@@ -0,0 +1,215 @@
+# benchmarks/run_benchmarks.py
+# Times the engine's hot paths at catalog scale and saves the results as JSON
+#
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --sizes 1 1000 --compare benchmarks/results/old.json
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from engine import recommender
+from engine.competitor import analyze_competitors, analyze_competitors_batch
+from engine.elasticity import calculate_elasticity, calculate_elasticity_batch
+from engine.metrics import metrics
+
+SIZES = [1, 1_000, 100_000, 1_000_000]
+E2E_SIZES = [1, 1_000]        # every call is a real HTTP round trip, so larger runs take minutes
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def make_catalog(size, seed=0):
+    rng = np.random.default_rng(seed)
+    your_price = np.round(rng.uniform(5, 100, size), 2)
+    return {
+        "old_price": np.round(your_price * rng.choice([0.8, 0.9, 1.0, 1.1], size), 2),
+        "your_price": your_price,
+        "old_units": rng.integers(0, 500, size).astype(np.float64),
+        "units_sold": rng.integers(0, 500, size).astype(np.float64),
+        "cost": np.round(your_price * rng.uniform(0.3, 0.8, size), 2),
+        "competitors": np.round(your_price[:, None] * rng.uniform(0.7, 1.3, (size, 3)), 2),
+    }
+
+
+def measure(run, size, min_time=0.2):
+    """
+    Runs `run` until at least min_time seconds have passed and returns the
+    best single-run time, so tiny sizes still get a stable number.
+    """
+    best = float("inf")
+    spent = 0.0
+    while spent < min_time:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+    return {
+        "size": size,
+        "seconds": best,
+        "us_per_item": best / size * 1e6,
+        "items_per_second": size / best if best else None,
+    }
+
+
+def bench_engine(size):
+    catalog = make_catalog(size)
+    columns = {key: value.tolist() for key, value in catalog.items() if key != "competitors"}
+    competitor_lists = catalog["competitors"].tolist()
+    competitor_table = pd.DataFrame({
+        "sku": np.repeat(np.arange(size), 3),
+        "our_price": np.repeat(catalog["your_price"], 3),
+        "competitor_price": catalog["competitors"].ravel(),
+    })
+    competitor_data = analyze_competitors(columns["your_price"][0], competitor_lists[0])
+
+    cases = {
+        "calculate_elasticity": lambda: [
+            calculate_elasticity(a, b, c, d) for a, b, c, d in zip(
+                columns["old_price"], columns["your_price"], columns["old_units"], columns["units_sold"])
+        ],
+        "calculate_elasticity_batch": lambda: calculate_elasticity_batch(
+            catalog["old_price"], catalog["your_price"], catalog["old_units"], catalog["units_sold"]),
+        "analyze_competitors": lambda: [
+            analyze_competitors(price, prices) for price, prices in zip(columns["your_price"], competitor_lists)
+        ],
+        "analyze_competitors_batch": lambda: analyze_competitors_batch(competitor_table),
+        "build_prompt": lambda: [
+            recommender.build_prompt("Handmade Soy Candle", "Handmade Goods", price, cost, 120,
+                                     "elastic", 42.5, competitor_data, "Maximize Profit")
+            for price, cost in zip(columns["your_price"], columns["cost"])
+        ],
+    }
+    return [{"case": name, **measure(run, size)} for name, run in cases.items()]
+
+
+def bench_end_to_end(size, server):
+    products = [{
+        "product_name": f"Product {i}",
+        "category": "Other",
+        "your_price": 19.99,
+        "cost": 8.0,
+        "units_sold": 120,
+        "elasticity_label": "elastic",
+        "margin": 59.98,
+        "competitor_data": None,
+        "goal": "Maximize Profit",
+    } for i in range(size)]
+
+    # Warm up so client construction and the first connection aren't timed.
+    recommender.get_recommendation(**products[0], use_cache=False)
+    asyncio.run(recommender.get_recommendations_async(products[:1], use_cache=False))
+
+    cases = {
+        "get_recommendation": lambda: [
+            recommender.get_recommendation(**product, use_cache=False) for product in products
+        ],
+        "get_recommendations_async": lambda: asyncio.run(
+            recommender.get_recommendations_async(products, concurrency=32, use_cache=False)
+        ),
+        "get_batch_recommendations_async": lambda: asyncio.run(
+            recommender.get_batch_recommendations_async(products, concurrency=32)
+        ),
+    }
+
+    settings = {"latency": server.latency, "tokens_per_second": server.tokens_per_second}
+    results = []
+    for name, run in cases.items():
+        metrics.reset()
+        requests_before, connections_before = server.requests, server.connections
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        results.append({
+            "case": name, "size": size, "seconds": seconds,
+            "us_per_item": seconds / size * 1e6, "items_per_second": size / seconds,
+            "requests": server.requests - requests_before,
+            "connections": server.connections - connections_before,
+            "prompt_tokens": metrics.counters["prompt_tokens"],
+            "cached_tokens": metrics.counters["cached_tokens"],
+            "completion_tokens": metrics.counters["completion_tokens"],
+            **settings,
+        })
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding="utf-8") as file:
+        previous = {(r["case"], r["size"]): r for r in json.load(file)["results"]}
+    for result in results:
+        before = previous.get((result["case"], result["size"]))
+        if before:
+            ratio = result["seconds"] / before["seconds"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{result['case']:<32} {result['size']:>9,}  {ratio:5.2f}x time{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pricing engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--e2e-sizes", type=int, nargs="*", default=E2E_SIZES)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake LLM speed; 0 = instant")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for result in bench_engine(size):
+            results.append(result)
+            print(f"{result['case']:<32} {size:>9,}  {result['us_per_item']:10.3f} us/item")
+
+    if args.e2e_sizes:
+        with FakeLLMServer(latency=args.latency, tokens_per_second=args.tokens_per_second) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+            recommender.configure_client()    # rebuild the clients against the fake server
+            for size in args.e2e_sizes:
+                for result in bench_end_to_end(size, server):
+                    results.append(result)
+                    print(f"{result['case']:<32} {size:>9,}  {result['us_per_item']:10.3f} us/item")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({"meta": metadata(), "results": results}, file, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
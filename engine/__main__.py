@@ -0,0 +1,129 @@
+# engine/__main__.py
+# Headless batch scoring: python -m engine catalog.csv results.jsonl
+
+import argparse
+import sys
+import time
+
+from engine.catalog import (
+    analyze_catalog_chunk, competitor_data_for_row, count_rows, product_for_row, read_catalog, write_chunk
+)
+from engine.metrics import metrics
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m engine",
+        description="Score a product catalog (CSV, JSONL, JSON or Parquet) in chunks."
+    )
+    parser.add_argument("catalog", help="input catalog file")
+    parser.add_argument("output", help="output file (.csv or .jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="products per chunk")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="skip this many products and append to the output")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue after the rows already in the output file")
+    parser.add_argument("--recommend", choices=["none", "local", "ai", "auto"], default="none",
+                        help="add price recommendations: local optimizer, AI, or local with AI fallback")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel AI requests")
+    parser.add_argument("--batch-size", type=int, default=25,
+                        help="products per AI request; 1 sends one free-text prompt per product")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write stage timings and token counts (.prom for Prometheus text, else JSON lines)")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    return parser.parse_args(argv)
+
+
+def add_recommendations(result, mode, concurrency, batch_size=1):
+    """
+    Adds recommendation columns to an analyzed chunk.
+    """
+    from engine.optimizer import MIN_CONFIDENCE, format_price_recommendation, recommend_price
+
+    rows = result.to_dict("records")
+    texts = [None] * len(rows)
+    sources = [None] * len(rows)
+    suggested = [None] * len(rows)
+    confidence = [None] * len(rows)
+
+    if mode in ("local", "auto"):
+        for i, row in enumerate(rows):
+            elasticity = None if row["elasticity"] != row["elasticity"] else row["elasticity"]
+            local = recommend_price(row["your_price"], row["cost"], elasticity,
+                                    competitor_data_for_row(row), row["goal"])
+            if local is None:
+                continue
+            suggested[i] = local["suggested_price"]
+            confidence[i] = local["confidence"]
+            if mode == "local" or local["confidence"] >= MIN_CONFIDENCE:
+                texts[i] = format_price_recommendation(local)
+                sources[i] = "local"
+
+    if mode in ("ai", "auto"):
+        import asyncio
+        from engine.recommender import get_batch_recommendations_async, get_recommendations_async
+
+        pending = [i for i in range(len(rows)) if texts[i] is None]
+        products = [product_for_row(rows[i]) for i in pending]
+        if batch_size > 1:
+            answers = asyncio.run(get_batch_recommendations_async(
+                products, batch_size=batch_size, concurrency=concurrency
+            ))
+            for i, answer in zip(pending, answers):
+                if answer["error"] is None:
+                    suggested[i] = answer["recommendation"]["suggested_price"]
+                    answer["recommendation"] = format_price_recommendation(answer["recommendation"])
+        else:
+            answers = asyncio.run(get_recommendations_async(products, concurrency=concurrency))
+        for i, answer in zip(pending, answers):
+            texts[i] = answer["recommendation"] or answer["error"]
+            sources[i] = "ai" if answer["error"] is None else "error"
+
+    result["suggested_price"] = suggested
+    result["confidence"] = confidence
+    result["recommendation"] = texts
+    result["recommendation_source"] = sources
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from dotenv import load_dotenv
+    load_dotenv()    # PRICING_* settings from .env, before engine.recommender reads them
+
+    offset = args.offset
+    if args.resume:
+        offset = count_rows(args.output)
+    append = offset > 0
+
+    started = time.perf_counter()
+    processed = 0
+    for chunk in read_catalog(args.catalog, args.chunk_size, offset):
+        with metrics.span("analyze_chunk"):
+            result = analyze_catalog_chunk(chunk)
+        if args.recommend != "none":
+            with metrics.span("recommend_chunk"):
+                result = add_recommendations(result, args.recommend, args.concurrency, args.batch_size)
+        with metrics.span("write_chunk"):
+            write_chunk(result, args.output, append)
+        append = True
+
+        processed += len(result)
+        if not args.quiet:
+            elapsed = time.perf_counter() - started
+            print(f"\r{offset + processed:,} products done ({processed / elapsed:,.0f} rows/s)",
+                  end="", file=sys.stderr, flush=True)
+
+    elapsed = time.perf_counter() - started
+    if not args.quiet:
+        print(file=sys.stderr)
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"Processed {processed:,} products in {elapsed:.2f}s ({rate:,.0f} rows/s); "
+          f"resume with --offset {offset + processed}", file=sys.stderr)
+    if args.metrics:
+        metrics.write(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# engine/cache.py
+# Caches AI recommendations so identical requests skip the OpenAI call
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "recommendations.db")
+
+
+def prompt_inputs(product_name, category, your_price, cost, units_sold,
+                  elasticity_label, margin, competitor_data, goal):
+    """
+    get_recommendation's arguments as they go into the prompt: whitespace in
+    the product name collapsed, money and percentages rounded to cents and
+    units sold as a whole number. build_prompt and make_cache_key both use
+    this, so two requests share a cache key only when their prompts match.
+    """
+    def money(value):
+        return round(float(value), 2) if value is not None else None
+
+    competitors = None
+    if competitor_data:
+        competitors = {
+            key: money(value) if isinstance(value, (int, float)) else value
+            for key, value in competitor_data.items()
+        }
+
+    return {
+        "product_name": " ".join(str(product_name).split()),
+        "category": category,
+        "your_price": money(your_price),
+        "cost": money(cost),
+        "units_sold": int(units_sold),
+        "elasticity_label": elasticity_label,
+        "margin": money(margin),
+        "competitor_data": competitors,
+        "goal": goal,
+    }
+
+
+def make_cache_key(product_name, category, your_price, cost, units_sold,
+                   elasticity_label, margin, competitor_data, goal,
+                   model, temperature):
+    """
+    Builds a stable hash of everything that goes into the prompt
+    (see prompt_inputs), plus the model settings.
+    """
+    inputs = prompt_inputs(product_name, category, your_price, cost, units_sold,
+                           elasticity_label, margin, competitor_data, goal)
+    inputs.update(model=model, temperature=temperature)
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """
+    Two-tier cache: an in-memory TTL/LRU tier in front of a SQLite file
+    that survives Streamlit restarts. Safe to share across threads.
+    Disk errors (read-only folder, a database locked by other workers) are
+    counted in stats["errors"] and the call carries on with memory only,
+    so a cache problem never costs an answer.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_items=1024, ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=max_items, ttl=ttl)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._db = None
+
+    def get(self, key):
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats["memory_hits"] += 1
+                return value
+
+            if self.path:
+                try:
+                    row = self._connect().execute(
+                        "SELECT value, created_at FROM recommendations WHERE key = ?", (key,)
+                    ).fetchone()
+                except (sqlite3.Error, OSError):
+                    self.stats["errors"] += 1
+                    row = None
+                if row and time.time() - row[1] < self.ttl:
+                    self.memory[key] = row[0]
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self.memory[key] = value
+            if self.path:
+                try:
+                    db = self._connect()
+                    db.execute(
+                        "INSERT OR REPLACE INTO recommendations (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, value, time.time())
+                    )
+                    db.commit()
+                except (sqlite3.Error, OSError):
+                    self.stats["errors"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            if self.path:
+                db = self._connect()
+                db.execute("DELETE FROM recommendations")
+                db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _connect(self):
+        # Opened on first use so importing the engine never touches disk.
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._db
+
+
+class SimilarityCache:
+    """
+    Second-level cache for products that differ by cents: answers are keyed
+    on bucketed features (price, margin, elasticity label, market position,
+    which side of the competitor average the price is on, category, goal)
+    instead of exact inputs. Prices fall in buckets
+    `price_width` wide in relative terms (0.05 = 5%), margins in buckets
+    `margin_width` percentage points wide, centred on multiples of the
+    width so round figures like 60% sit mid-bucket rather than on an edge.
+    Stored answers are templates: the product name, input figures and
+    suggested prices are filled in for the product asking, with suggested
+    prices scaled to its price.
+    """
+
+    def __init__(self, max_items=4096, ttl=24 * 3600, price_width=0.05, margin_width=5.0):
+        self.price_width = price_width
+        self.margin_width = margin_width
+        self.memory = TTLCache(maxsize=max_items, ttl=ttl)
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def key(self, product, model, temperature):
+        """
+        The bucketed features of a product (get_recommendation's arguments),
+        or None when it can't be bucketed.
+        """
+        price, margin = product["your_price"], product["margin"]
+        if not price or price <= 0 or margin is None:
+            return None
+        competitors = product["competitor_data"]
+        # "Priced at market" spans -10% to +10%, and templates keep the words
+        # around the gap ("below the average"), so the gap's sign is part of the key.
+        gap = competitors.get("price_gap") if competitors else None
+        return (
+            round(math.log(price) / math.log1p(self.price_width)),
+            round(margin / self.margin_width),
+            product["elasticity_label"],
+            competitors["position"] if competitors else None,
+            (gap > 0) - (gap < 0) if gap is not None else None,
+            product["category"],
+            product["goal"],
+            model,
+            temperature,
+        )
+
+    def get(self, product, model, temperature):
+        key = self.key(product, model, temperature)
+        with self._lock:
+            template = self.memory.get(key) if key is not None else None
+            if template is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        return fill_template(template, product)
+
+    def set(self, product, model, temperature, text):
+        key = self.key(product, model, temperature)
+        template = make_template(text, product) if key is not None else None
+        if template is not None:
+            with self._lock:
+                self.memory[key] = template
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def report(self):
+        return {**self.stats, "hit_rate": round(self.hit_rate(), 4), "entries": len(self.memory)}
+
+
+# Input figures that appear in answers as "$X" (MONEY_FIELDS) or "X%".
+MONEY_FIELDS = ("your_price", "cost", "avg_competitor_price", "lowest_competitor", "highest_competitor")
+MONEY = re.compile(r"\$(\d[\d,]*(?:\.\d+)?)")
+PERCENT = re.compile(r"(\d+(?:\.\d+)?)%")
+PLACEHOLDER = re.compile(r"\[\[(\w+)(?::([\d.]+))?\]\]")
+MIN_NAME_LENGTH = 5    # shorter names ("Tea", "Cap") also match ordinary words
+
+
+def make_template(text, product):
+    """
+    Turns an answer into a template: figures equal to one of the product's
+    inputs become [[field]], other dollar amounts (the suggested prices)
+    become [[scaled:ratio]] relative to its price, and the product name
+    becomes [[product_name]] where it stands as a whole word. Returns None
+    when the answer mentions a name too short to replace safely.
+    """
+    figures = _template_figures(product)
+    price = float(product["your_price"])
+
+    def money(match):
+        value = float(match.group(1).replace(",", ""))
+        for field in MONEY_FIELDS:
+            if figures.get(field) is not None and abs(value - figures[field]) < 0.005:
+                return f"$[[{field}]]"
+        return f"$[[scaled:{value / price:.6f}]]"
+
+    def percent(match):
+        value = float(match.group(1))
+        for field in ("margin", "price_gap_percent"):
+            if figures.get(field) is not None and abs(value - figures[field]) < 0.005:
+                return f"[[{field}]]%"
+        return match.group(0)
+
+    text = MONEY.sub(money, text)
+    text = PERCENT.sub(percent, text)
+    name = str(product["product_name"]).strip()
+    if name:
+        pattern = re.compile(rf"(?<!\w){re.escape(name)}(?!\w)", re.IGNORECASE)
+        if len(name) < MIN_NAME_LENGTH:
+            if pattern.search(text):
+                return None
+        else:
+            text = pattern.sub("[[product_name]]", text)
+    return text
+
+
+def fill_template(template, product):
+    """
+    Fills a make_template template in with another product's figures.
+    """
+    figures = _template_figures(product)
+
+    def fill(match):
+        field, ratio = match.groups()
+        if field == "product_name":
+            return str(product["product_name"]).strip()
+        if field == "scaled":
+            return f"{float(product['your_price']) * float(ratio):,.2f}"
+        if field in ("margin", "price_gap_percent"):
+            return f"{figures[field]:.2f}".rstrip("0").rstrip(".")
+        return f"{figures[field]:,.2f}"
+
+    return PLACEHOLDER.sub(fill, template)
+
+
+def _template_figures(product):
+    competitors = product["competitor_data"] or {}
+    figures = {
+        "your_price": product["your_price"],
+        "cost": product["cost"],
+        "margin": product["margin"],
+        **{field: competitors.get(field) for field in MONEY_FIELDS[2:]},
+        "price_gap_percent": competitors.get("price_gap_percent"),
+    }
+    figures = {field: float(value) if value is not None else None for field, value in figures.items()}
+    if figures["price_gap_percent"] is not None:
+        figures["price_gap_percent"] = abs(figures["price_gap_percent"])
+    return figures
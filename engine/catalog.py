@@ -0,0 +1,254 @@
+# engine/catalog.py
+# Reads product catalogs in chunks and scores them in bulk
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from engine.competitor import analyze_competitors_batch
+from engine.elasticity import ELASTICITY_LABELS, calculate_elasticity_batch, get_margin_batch, interpret_elasticity_batch
+
+# One record per product, same fields as the app's inputs. competitor_prices
+# is a list (JSON, JSONL, Parquet) or a ";"-separated string (CSV).
+CATALOG_COLUMNS = {
+    "sku": None,
+    "product_name": "",
+    "category": "Other",
+    "your_price": 0.0,
+    "cost": 0.0,
+    "units_sold": 0,
+    "old_price": 0.0,
+    "old_units": 0,
+    "competitor_prices": None,
+    "goal": "Maximize Profit",
+}
+
+
+def read_catalog(path, chunk_size=50_000, offset=0):
+    """
+    Yields the catalog as DataFrames of at most chunk_size rows, skipping the
+    first `offset` products. Supports .csv, .jsonl, .json (a list of
+    products) and .parquet, and never holds more than one chunk in memory.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".csv":
+        chunks = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, offset + 1))
+    elif extension == ".jsonl":
+        chunks = _skip_rows(pd.read_json(path, lines=True, chunksize=chunk_size), offset)
+    elif extension == ".json":
+        chunks = _skip_rows(_json_array_chunks(path, chunk_size), offset)
+    elif extension == ".parquet":
+        chunks = _skip_rows(_parquet_chunks(path, chunk_size), offset)
+    else:
+        raise ValueError(f"Unsupported catalog format: {extension}")
+
+    start = offset
+    for chunk in chunks:
+        if len(chunk):
+            yield _normalize(chunk, start)
+            start += len(chunk)
+
+
+def analyze_catalog_chunk(chunk):
+    """
+    Runs elasticity, margin and competitor analysis over one chunk.
+    Returns a DataFrame with one row per product.
+    """
+    elasticity = calculate_elasticity_batch(
+        chunk["old_price"], chunk["your_price"], chunk["old_units"], chunk["units_sold"]
+    )
+    labels = np.asarray(ELASTICITY_LABELS, dtype=object)[interpret_elasticity_batch(elasticity)]
+
+    result = pd.DataFrame({
+        "sku": chunk["sku"].to_numpy(),
+        "product_name": chunk["product_name"].to_numpy(),
+        "category": chunk["category"].to_numpy(),
+        "goal": chunk["goal"].to_numpy(),
+        "your_price": chunk["your_price"].to_numpy(),
+        "cost": chunk["cost"].to_numpy(),
+        "units_sold": chunk["units_sold"].to_numpy(),
+        "elasticity": elasticity,
+        "elasticity_label": labels,
+        "margin": get_margin_batch(chunk["your_price"], chunk["cost"]),
+    })
+
+    competitors = _competitor_table(chunk)
+    stats = analyze_competitors_batch(competitors).set_index("sku")
+    stats = stats.drop(columns="your_price").reindex(range(len(chunk)))
+    stats["competitor_count"] = stats["competitor_count"].fillna(0).astype(np.int64)
+    stats["position"] = stats["position"].astype(object).where(stats["position"].notna(), None)
+    for column in stats.columns:
+        result[column] = stats[column].to_numpy()
+    return result
+
+
+def competitor_data_for_row(row):
+    """
+    The analyze_competitors dict for one analyzed row, or None without competitors.
+    """
+    if not row["competitor_count"]:
+        return None
+    return {
+        "avg_competitor_price": row["avg_competitor_price"],
+        "lowest_competitor": row["lowest_competitor"],
+        "highest_competitor": row["highest_competitor"],
+        "price_gap": row["price_gap"],
+        "price_gap_percent": row["price_gap_percent"],
+        "position": row["position"],
+    }
+
+
+def product_for_row(row):
+    """
+    get_recommendation's keyword arguments for one analyzed row.
+    """
+    return {
+        "product_name": row["product_name"],
+        "category": row["category"],
+        "your_price": row["your_price"],
+        "cost": row["cost"],
+        "units_sold": row["units_sold"],
+        "elasticity_label": row["elasticity_label"],
+        "margin": row["margin"],
+        "competitor_data": competitor_data_for_row(row),
+        "goal": row["goal"],
+    }
+
+
+def count_rows(path):
+    """
+    Number of data rows already written to a .csv or .jsonl output file.
+    CSV rows are counted as records, since quoted recommendation text can
+    span several lines.
+    """
+    if not os.path.exists(path):
+        return 0
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as file:
+            records = sum(1 for record in csv.reader(file) if record)
+        return max(records - 1, 0)
+    with open(path, "rb") as file:
+        return sum(1 for line in file if line.strip())
+
+
+def write_chunk(result, path, append):
+    """
+    Writes one analyzed chunk to a .csv or .jsonl file.
+    """
+    if path.lower().endswith(".csv"):
+        result.to_csv(path, mode="a" if append else "w", header=not append, index=False)
+    elif path.lower().endswith(".jsonl"):
+        with open(path, "a" if append else "w", encoding="utf-8") as file:
+            result.to_json(file, orient="records", lines=True)
+    else:
+        raise ValueError("Output must be a .csv or .jsonl file")
+
+
+def _normalize(chunk, start):
+    chunk = chunk.reset_index(drop=True)
+    for column, default in CATALOG_COLUMNS.items():
+        if column not in chunk:
+            chunk[column] = default
+    if chunk["sku"].isna().all():
+        chunk["sku"] = np.arange(start, start + len(chunk))
+    for column in ("your_price", "cost", "units_sold", "old_price", "old_units"):
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").fillna(0.0)
+    return chunk
+
+
+def _competitor_table(chunk):
+    # Long format: one row per (product position, competitor price > 0).
+    lists = [_parse_prices(prices) for prices in chunk["competitor_prices"]]
+    lengths = np.fromiter((len(prices) for prices in lists), dtype=np.int64, count=len(lists))
+    flat = np.fromiter((price for prices in lists for price in prices), dtype=np.float64,
+                       count=int(lengths.sum()))
+    positions = np.repeat(np.arange(len(chunk)), lengths)
+    return pd.DataFrame({
+        "sku": positions,
+        "our_price": chunk["your_price"].to_numpy()[positions],
+        "competitor_price": flat,
+    })
+
+
+def _parse_prices(prices):
+    # A column holding single prices reads as numbers, and in CSV text ";"
+    # separates prices while "," only groups thousands ("1,299.00;1,350.00").
+    if prices is None:
+        return []
+    if isinstance(prices, (int, float, np.number)):
+        prices = [] if np.isnan(prices) else [prices]
+    elif isinstance(prices, str):
+        prices = prices.split(";")
+    found = []
+    for price in prices:
+        if isinstance(price, str):
+            price = price.strip().lstrip("$").replace(",", "")
+            if not price:
+                continue
+        if float(price) > 0:
+            found.append(float(price))
+    return found
+
+
+def _skip_rows(chunks, offset):
+    for chunk in chunks:
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        yield chunk.iloc[offset:]
+        offset = 0
+
+
+def _parquet_chunks(path, chunk_size):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def _json_array_chunks(path, chunk_size, block_size=1 << 20):
+    """
+    Streams a JSON file holding a list of product objects without parsing it
+    all at once. An empty file is an empty catalog.
+    """
+    decoder = json.JSONDecoder()
+    records = []
+    buffer = ""
+    started = False
+
+    with open(path, encoding="utf-8") as file:
+        while True:
+            block = file.read(block_size)
+            buffer += block
+            position = 0
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if not started and position < len(buffer):
+                    if buffer[position] != "[":
+                        raise ValueError("Expected a JSON list of products")
+                    started = True
+                    position += 1
+                    continue
+                if position >= len(buffer) or buffer[position] == "]":
+                    break
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not block:
+                        raise
+                    break    # object continues in the next block
+                records.append(record)
+                if len(records) == chunk_size:
+                    yield pd.DataFrame.from_records(records)
+                    records = []
+            buffer = buffer[position:]
+            if not block:
+                break
+
+    if records:
+        yield pd.DataFrame.from_records(records)
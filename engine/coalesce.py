@@ -0,0 +1,99 @@
+# engine/coalesce.py
+# Collapses identical concurrent calls into one
+
+import threading
+import weakref
+from concurrent.futures import Future
+
+from engine.metrics import metrics
+
+
+class LeaderGone(Exception):
+    """
+    The caller making a shared call stopped before it finished (a closed
+    stream, an interrupt). Waiters should ask again rather than fail.
+    """
+
+
+class SingleFlight:
+    """
+    For threaded callers: while a call for `key` is running, other callers
+    with the same key wait for its result instead of making their own call.
+    If the call fails, every waiter gets the same error. If the caller
+    making it goes away instead, one of the waiters makes the call.
+    """
+
+    def __init__(self):
+        self.stats = {"calls": 0, "collapsed": 0}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        while True:
+            future, leader = self.begin(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except LeaderGone:
+                continue
+        try:
+            result = fn()
+        except BaseException as error:
+            self.finish(key, future, error=error)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def begin(self, key):
+        """
+        Returns (future, leader). The leader makes the call and must pass its
+        outcome to finish(); everyone else waits on future.result() and
+        calls begin() again if that raises LeaderGone.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["collapsed"] += 1
+                metrics.increment("coalesced_calls")
+                return future, False
+            future = self._calls[key] = Future()
+            self.stats["calls"] += 1
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        else:
+            # GeneratorExit or KeyboardInterrupt belong to the leader's caller,
+            # not to the waiters, who get to retry.
+            if not isinstance(error, Exception):
+                error = LeaderGone(type(error).__name__)
+            future.set_exception(error)
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for asyncio callers. The shared call runs as its own task,
+    so a waiter being cancelled doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self.stats = {"calls": 0, "collapsed": 0}
+        self._calls = weakref.WeakKeyDictionary()    # event loop -> {key: task}
+
+    async def do(self, key, make_call):
+        import asyncio
+
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is None:
+            task = calls[key] = asyncio.ensure_future(make_call())
+            task.add_done_callback(lambda done: calls.pop(key) if calls.get(key) is done else None)
+            self.stats["calls"] += 1
+        else:
+            self.stats["collapsed"] += 1
+            metrics.increment("coalesced_calls")
+        return await asyncio.shield(task)
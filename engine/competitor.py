@@ -1,11 +1,27 @@
 # engine/competitor.py
 # Analyzes competitor pricing and your market position
 
+import math
+import random
+import struct
+
+import numpy as np
+
+from engine.elasticity import _round2
+
+# Position codes used by the batch functions. The code is the index into this tuple.
+MARKET_POSITIONS = ("priced at market", "priced above market", "priced below market")
+
+
 def analyze_competitors(your_price, competitor_prices):
     """
-    Takes your price and a list of competitor prices.
+    Takes your price and a list (or array) of competitor prices of any length.
     Returns key stats about your market position.
     """
+    if hasattr(competitor_prices, "tolist"):
+        competitor_prices = competitor_prices.tolist()
+    elif not isinstance(competitor_prices, (list, tuple)):
+        competitor_prices = list(competitor_prices)
     if not competitor_prices:
         return None
 
@@ -37,4 +53,346 @@ def get_market_position(price_gap_percent):
     elif price_gap_percent < -10:
         return "priced below market"
     else:
-        return "priced at market"
\ No newline at end of file
+        return "priced at market"
+
+
+def competitor_distribution(your_price, competitor_prices, bins=20):
+    """
+    Summarizes any number of competitor prices into a fixed-size histogram
+    plus percentile bands, so charts cost the same for 5 or 5,000 listings.
+    """
+    prices = np.asarray(competitor_prices, dtype=np.float64)
+    if prices.size == 0:
+        return None
+
+    low, high = float(prices.min()), float(prices.max())
+    if low == high:
+        low, high = low * 0.95, high * 1.05 or 1.0
+    counts, edges = np.histogram(prices, bins=bins, range=(low, high))
+    p10, p25, median, p75, p90 = np.percentile(prices, [10, 25, 50, 75, 90])
+
+    return {
+        "counts": counts.tolist(),
+        "edges": np.round(edges, 2).tolist(),
+        "your_bin": int(np.clip(np.searchsorted(edges, your_price, side="right") - 1, 0, bins - 1)),
+        "p10": round(float(p10), 2),
+        "p25": round(float(p25), 2),
+        "median": round(float(median), 2),
+        "p75": round(float(p75), 2),
+        "p90": round(float(p90), 2),
+        "your_percentile": round(float(np.mean(prices <= your_price)) * 100, 1),
+        "competitor_count": int(prices.size),
+    }
+
+
+def analyze_competitors_batch(table, sku_col="sku", price_col="our_price",
+                              competitor_col="competitor_price"):
+    """
+    Catalog-wide version of analyze_competitors.
+    Takes a long-format pandas DataFrame or Arrow table with one row per
+    competitor observation (sku, our_price, competitor_price) and returns a
+    DataFrame with one row per SKU and the same fields as analyze_competitors,
+    plus competitor_count. Rows with a missing SKU or competitor price are ignored.
+    """
+    import pandas as pd
+
+    if not isinstance(table, pd.DataFrame):
+        table = table.select([sku_col, price_col, competitor_col]).to_pandas()
+
+    table = table[table[sku_col].notna() & table[competitor_col].notna()]
+    codes, skus = pd.factorize(table[sku_col], sort=False)
+    competitor_prices = table[competitor_col].to_numpy(dtype=np.float64)
+
+    # bincount adds left to right like sum() does, so averages round the
+    # same way as analyze_competitors (pandas' mean is compensated).
+    count = np.bincount(codes, minlength=len(skus))
+    total = np.bincount(codes, weights=competitor_prices, minlength=len(skus))
+
+    grouped = pd.Series(competitor_prices).groupby(codes, sort=True)
+    result = pd.DataFrame({
+        sku_col: skus,
+        "your_price": table[price_col].groupby(codes, sort=True).first().to_numpy(),
+        "lowest_competitor": grouped.min().to_numpy(),
+        "highest_competitor": grouped.max().to_numpy(),
+        "competitor_count": count,
+    })
+
+    your_price = result["your_price"].to_numpy(dtype=np.float64)
+    avg = _round2(total / count)
+    gap = _round2(your_price - avg)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_percent = _round2(gap / avg * 100)
+
+    result["avg_competitor_price"] = avg
+    result["price_gap"] = gap
+    result["price_gap_percent"] = gap_percent
+    result["position"] = pd.Categorical.from_codes(
+        get_market_position_batch(gap_percent), MARKET_POSITIONS
+    )
+    return result
+
+
+def get_market_position_batch(price_gap_percents):
+    """
+    Array version of get_market_position.
+    Returns int8 codes; MARKET_POSITIONS[code] gives the label.
+    """
+    price_gap_percents = np.asarray(price_gap_percents, dtype=np.float64)
+    codes = np.zeros(price_gap_percents.shape, dtype=np.int8)     # at market
+    codes[price_gap_percents > 10] = 1                              # above market
+    codes[price_gap_percents < -10] = 2                             # below market
+    return codes
+
+
+class CompetitorStats:
+    """
+    Running competitor price stats for one SKU, updated one quote at a time.
+    Each competitor has at most one live quote, so memory is bounded by the
+    number of competitors, not by how many updates have streamed through.
+    Mean and variance use Welford's update, so the average can differ from
+    analyze_competitors in the last floating-point digit.
+    """
+
+    __slots__ = ("quotes", "count", "mean", "_m2", "lowest", "highest")
+
+    def __init__(self):
+        self.quotes = {}
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.lowest = None
+        self.highest = None
+
+    def update(self, competitor, price):
+        """
+        Records a competitor's latest quote, replacing any earlier one.
+        """
+        old_price = self.quotes.pop(competitor, None)
+        if old_price is not None:
+            self._discard(old_price)
+        self.quotes[competitor] = price
+        self._add(price)
+
+    def remove(self, competitor):
+        """
+        Drops a competitor's quote, e.g. when a listing goes away.
+        """
+        old_price = self.quotes.pop(competitor, None)
+        if old_price is not None:
+            self._discard(old_price)
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return None
+        return self._m2 / self.count
+
+    def analyze(self, your_price):
+        """
+        Returns the same dict as analyze_competitors(your_price, current quotes).
+        """
+        if self.count == 0:
+            return None
+
+        avg_competitor_price = round(self.mean, 2)
+        price_gap = round(your_price - avg_competitor_price, 2)
+        price_gap_percent = round((price_gap / avg_competitor_price) * 100, 2)
+
+        return {
+            "avg_competitor_price": avg_competitor_price,
+            "lowest_competitor": self.lowest,
+            "highest_competitor": self.highest,
+            "price_gap": price_gap,
+            "price_gap_percent": price_gap_percent,
+            "position": get_market_position(price_gap_percent)
+        }
+
+    def _add(self, price):
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (price - self.mean)
+
+        if self.lowest is None or price < self.lowest:
+            self.lowest = price
+        if self.highest is None or price > self.highest:
+            self.highest = price
+
+    def _discard(self, price):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = 0.0
+            self._m2 = 0.0
+            self.lowest = None
+            self.highest = None
+            return
+
+        delta = price - self.mean
+        self.mean -= delta / self.count
+        self._m2 = max(self._m2 - delta * (price - self.mean), 0.0)
+
+        # Only losing the current extreme needs a look at the other quotes.
+        if price == self.lowest:
+            self.lowest = min(self.quotes.values())
+        if price == self.highest:
+            self.highest = max(self.quotes.values())
+
+
+class CompetitorFeed:
+    """
+    Keeps a CompetitorStats per SKU for a continuous competitor price feed.
+    """
+
+    def __init__(self):
+        self.skus = {}
+
+    def update(self, sku, competitor, price):
+        stats = self.skus.get(sku)
+        if stats is None:
+            stats = self.skus[sku] = CompetitorStats()
+        stats.update(competitor, price)
+
+    def remove(self, sku, competitor):
+        stats = self.skus.get(sku)
+        if stats is not None:
+            stats.remove(competitor)
+
+    def analyze(self, sku, your_price):
+        stats = self.skus.get(sku)
+        return stats.analyze(your_price) if stats is not None else None
+
+
+class PriceSketch:
+    """
+    KLL quantile sketch of one SKU's competitor prices.
+    Holds at most about 3 * k prices no matter how many are added (~2-3 KB
+    at the default k=128), with rank error around 1%. Sketches built on
+    different shards can be merged and shipped around with to_bytes().
+    """
+
+    PERCENTILES = (("p10", 0.10), ("p25", 0.25), ("median", 0.50), ("p75", 0.75), ("p90", 0.90))
+
+    def __init__(self, k=128):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self._size = 0
+        self._random = random.Random()
+
+    def update(self, price):
+        """
+        Adds one competitor price.
+        """
+        self.levels[0].append(price)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size():
+            self._compress()
+
+    def update_many(self, prices):
+        for price in prices:
+            self.update(price)
+
+    def merge(self, other):
+        """
+        Folds another sketch into this one. Returns self.
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in zip(self.levels, other.levels):
+            level.extend(items)
+        self.n += other.n
+        self._size += other._size
+        while self._size >= self._max_size():
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Price at fraction q (0-1) of the distribution.
+        """
+        if self.n == 0:
+            return None
+        prices, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        index = int(np.searchsorted(cumulative, q * self.n, side="left"))
+        return float(prices[min(index, len(prices) - 1)])
+
+    def rank(self, price):
+        """
+        Fraction of competitor prices at or below price.
+        """
+        if self.n == 0:
+            return None
+        prices, weights = self._weighted()
+        return float(weights[prices <= price].sum() / self.n)
+
+    def summary(self, your_price):
+        """
+        Returns p10/p25/median/p75/p90 and your price's percentile (0-100).
+        """
+        if self.n == 0:
+            return None
+
+        result = {name: round(self.quantile(q), 2) for name, q in self.PERCENTILES}
+        result["your_percentile"] = round(self.rank(your_price) * 100, 1)
+        result["competitor_count"] = self.n
+        return result
+
+    def to_bytes(self):
+        sizes = [len(level) for level in self.levels]
+        flat = [price for level in self.levels for price in level]
+        return (
+            struct.pack("<IQI", self.k, self.n, len(sizes))
+            + struct.pack(f"<{len(sizes)}I", *sizes)
+            + struct.pack(f"<{len(flat)}d", *flat)
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        k, n, height = struct.unpack_from("<IQI", data)
+        offset = struct.calcsize("<IQI")
+        sizes = struct.unpack_from(f"<{height}I", data, offset)
+        offset += 4 * height
+        flat = struct.unpack_from(f"<{sum(sizes)}d", data, offset)
+
+        sketch = cls(k)
+        sketch.n = n
+        sketch.levels = []
+        for size in sizes:
+            sketch.levels.append(list(flat[:size]))
+            flat = flat[size:]
+        sketch._size = sum(sizes)
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def _compress(self):
+        # Halve the lowest full level: sort it, keep every other item from a
+        # random offset and promote the survivors with doubled weight.
+        for level, items in enumerate(self.levels):
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+
+            items.sort()
+            leftover = [items.pop()] if len(items) % 2 else []
+            self.levels[level + 1].extend(items[self._random.getrandbits(1)::2])
+            self.levels[level] = leftover
+
+            self._size = sum(len(items) for items in self.levels)
+            if self._size < self._max_size():
+                break
+
+    def _weighted(self):
+        prices = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.float64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(prices, kind="stable")
+        return prices[order], weights[order]
@@ -1,6 +1,15 @@
 # engine/elasticity.py
 # Calculates price elasticity and demand signals
 
+import numpy as np
+
+# Label codes used by the batch functions. The code is the index into this tuple.
+ELASTICITY_LABELS = ("unknown", "highly elastic", "elastic", "unit elastic", "inelastic")
+# Batch functions work through arrays this many rows at a time, so their
+# temporaries stay in CPU cache instead of making full passes over RAM.
+BLOCK_ROWS = 32768
+
+
 def calculate_elasticity(old_price, new_price, old_units, new_units):
     """
     Price Elasticity of Demand = % change in quantity / % change in price
@@ -45,4 +54,236 @@ def get_margin(price, cost):
     if price == 0:
         return 0
     margin = (price - cost) / price * 100
-    return round(margin, 2)
\ No newline at end of file
+    return round(margin, 2)
+
+
+def calculate_elasticity_batch(old_prices, new_prices, old_units, new_units):
+    """
+    Array version of calculate_elasticity.
+    Accepts NumPy arrays, pandas Series or Arrow arrays of equal length.
+    Rows where the scalar function would return None come back as NaN.
+    """
+    old_prices = np.asarray(old_prices, dtype=np.float64)
+    new_prices = np.asarray(new_prices, dtype=np.float64)
+    old_units = np.asarray(old_units, dtype=np.float64)
+    new_units = np.asarray(new_units, dtype=np.float64)
+    return _blockwise(_elasticity_block, old_prices, new_prices, old_units, new_units)
+
+
+def _elasticity_block(old_prices, new_prices, old_units, new_units):
+    percent_change_price = new_prices - old_prices
+    percent_change_price /= old_prices
+    percent_change_demand = new_units - old_units
+    percent_change_demand /= old_units
+    percent_change_demand /= percent_change_price
+    elasticity = _round2(percent_change_demand)
+
+    # Invalid rows (often every unchanged price) are scattered, and a masked
+    # copy branches on each one, so they are multiplied by NaN instead.
+    valid = old_prices != 0
+    valid &= old_units != 0
+    valid &= percent_change_price != 0
+    elasticity *= np.divide(valid, valid)    # 1.0, or 0/0 = NaN where invalid
+    return elasticity
+
+
+def interpret_elasticity_batch(elasticities):
+    """
+    Array version of interpret_elasticity.
+    Returns int8 label codes; ELASTICITY_LABELS[code] gives the label.
+    NaN elasticities map to "unknown".
+    """
+    elasticities = np.asarray(elasticities, dtype=np.float64)
+    codes = _blockwise(_label_block, elasticities.ravel(), dtype=np.int8)
+    return codes.reshape(elasticities.shape)
+
+
+def _label_block(elasticities):
+    # Start at 4 (inelastic) and step down one code per threshold crossed:
+    # == 1 -> 3 (unit elastic), > 1 -> 2 (elastic), > 2 -> 1 (highly elastic)
+    magnitude = np.abs(elasticities)
+    codes = (magnitude >= 1).view(np.int8)
+    codes += magnitude > 1
+    codes += magnitude > 2
+    np.subtract(4, codes, out=codes)
+    codes *= magnitude == magnitude    # NaN -> 0 (unknown)
+    return codes
+
+
+def get_margin_batch(prices, costs):
+    """
+    Array version of get_margin. Zero prices give a margin of 0.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    costs = np.asarray(costs, dtype=np.float64)
+    return _blockwise(_margin_block, prices, costs)
+
+
+def _margin_block(prices, costs):
+    margin = prices - costs
+    margin /= prices
+    margin *= 100
+    margin = _round2(margin)
+    np.copyto(margin, 0.0, where=prices == 0)
+    return margin
+
+
+def score_elasticity_batch(old_prices, new_prices, old_units, new_units, costs):
+    """
+    Runs elasticity, labels and margin over a whole catalog in one pass.
+    Margin is taken on the new (current) price, as the app does.
+    Returns (elasticity, label_codes, margin) arrays.
+    """
+    arrays = [np.asarray(array, dtype=np.float64)
+              for array in (old_prices, new_prices, old_units, new_units, costs)]
+    size = len(arrays[0])
+    elasticity = np.empty(size, dtype=np.float64)
+    label_codes = np.empty(size, dtype=np.int8)
+    margin = np.empty(size, dtype=np.float64)
+
+    # Each block's elasticities are labelled while they are still in cache.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, size, BLOCK_ROWS):
+            rows = slice(start, start + BLOCK_ROWS)
+            old_price, new_price, old_unit, new_unit, cost = (array[rows] for array in arrays)
+            elasticity[rows] = _elasticity_block(old_price, new_price, old_unit, new_unit)
+            label_codes[rows] = _label_block(elasticity[rows])
+            margin[rows] = _margin_block(new_price, cost)
+    return elasticity, label_codes, margin
+
+
+class LogLogElasticity:
+    """
+    Fits log(units) = a + b * log(price) per SKU, where the slope b is the
+    elasticity. Only running sums are stored, so each new observation is an
+    O(1) update and history never has to be rescanned.
+    SKUs are addressed by integer position 0..n_skus-1.
+    Observations with a zero/negative price or units are skipped (log undefined).
+    """
+
+    def __init__(self, n_skus):
+        self.n = np.zeros(n_skus, dtype=np.int64)
+        self.sum_x = np.zeros(n_skus)
+        self.sum_y = np.zeros(n_skus)
+        self.sum_xy = np.zeros(n_skus)
+        self.sum_xx = np.zeros(n_skus)
+        self.sum_yy = np.zeros(n_skus)
+
+    def update(self, sku, price, units):
+        """
+        Adds one price/units observation for a single SKU.
+        """
+        if price <= 0 or units <= 0:
+            return
+        x = np.log(price)
+        y = np.log(units)
+        self.n[sku] += 1
+        self.sum_x[sku] += x
+        self.sum_y[sku] += y
+        self.sum_xy[sku] += x * y
+        self.sum_xx[sku] += x * x
+        self.sum_yy[sku] += y * y
+
+    def update_batch(self, skus, prices, units):
+        """
+        Adds many observations at once, across any mix of SKUs.
+        """
+        skus = np.asarray(skus, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        units = np.asarray(units, dtype=np.float64)
+
+        keep = (prices > 0) & (units > 0)
+        skus = skus[keep]
+        x = np.log(prices[keep])
+        y = np.log(units[keep])
+
+        size = len(self.n)
+        self.n += np.bincount(skus, minlength=size)
+        self.sum_x += np.bincount(skus, weights=x, minlength=size)
+        self.sum_y += np.bincount(skus, weights=y, minlength=size)
+        self.sum_xy += np.bincount(skus, weights=x * y, minlength=size)
+        self.sum_xx += np.bincount(skus, weights=x * x, minlength=size)
+        self.sum_yy += np.bincount(skus, weights=y * y, minlength=size)
+
+    def estimate(self):
+        """
+        Returns (elasticity, standard_error, observations) arrays for every SKU.
+        Elasticity is NaN until a SKU has at least two distinct prices;
+        standard error needs at least three observations.
+        """
+        n = self.n.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sxx = self.sum_xx - self.sum_x ** 2 / n
+            sxy = self.sum_xy - self.sum_x * self.sum_y / n
+            syy = self.sum_yy - self.sum_y ** 2 / n
+
+            # Guard against the sums cancelling to tiny non-zero noise
+            # when every observation had the same price.
+            flat = sxx <= 1e-12 * np.maximum(self.sum_xx, 1.0)
+            slope = np.where(flat, np.nan, sxy / sxx)
+
+            residual = np.maximum(syy - slope * sxy, 0.0)
+            std_error = np.sqrt(residual / (n - 2) / sxx)
+        std_error[flat | (n < 3)] = np.nan
+        return np.round(slope, 2), std_error, self.n.copy()
+
+    def labels(self):
+        """
+        Label codes for every SKU, see interpret_elasticity_batch.
+        """
+        return interpret_elasticity_batch(self.estimate()[0])
+
+    def estimate_one(self, sku):
+        """
+        Returns (elasticity, standard_error, observations) for one SKU.
+        Missing values are None, like calculate_elasticity.
+        """
+        n = int(self.n[sku])
+        if n < 2:
+            return None, None, n
+
+        sxx = self.sum_xx[sku] - self.sum_x[sku] ** 2 / n
+        if sxx <= 1e-12 * max(self.sum_xx[sku], 1.0):
+            return None, None, n
+        sxy = self.sum_xy[sku] - self.sum_x[sku] * self.sum_y[sku] / n
+        syy = self.sum_yy[sku] - self.sum_y[sku] ** 2 / n
+
+        slope = sxy / sxx
+        std_error = None
+        if n > 2:
+            residual = max(syy - slope * sxy, 0.0)
+            std_error = float(np.sqrt(residual / (n - 2) / sxx))
+        return round(float(slope), 2), std_error, n
+
+    def label(self, sku):
+        """
+        Plain-English label for one SKU, via interpret_elasticity.
+        """
+        elasticity = self.estimate_one(sku)[0]
+        return interpret_elasticity(elasticity)
+
+
+def _blockwise(block, *arrays, dtype=np.float64):
+    # Runs block() over BLOCK_ROWS-row slices of equal-length arrays.
+    result = np.empty(len(arrays[0]), dtype=dtype)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, len(result), BLOCK_ROWS):
+            rows = slice(start, start + BLOCK_ROWS)
+            result[rows] = block(*(array[rows] for array in arrays))
+    return result
+
+
+def _round2(values):
+    """
+    Rounds to 2 decimals the same way Python's round() does.
+    np.round scales by 100 first, which can tip values sitting on a
+    half-cent tie the wrong way, so those few are redone in Python.
+    """
+    rounded = np.multiply(values, 100)
+    np.rint(rounded, out=rounded)
+    rounded /= 100
+    off = values - rounded
+    np.abs(off, out=off)
+    for i in np.flatnonzero(off > 0.005 - 1e-8):
+        rounded.flat[i] = round(float(values.flat[i]), 2)
+    return rounded
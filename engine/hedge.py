@@ -0,0 +1,172 @@
+# engine/hedge.py
+# Hedged requests: a backup call when the first one is slower than usual
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from engine.metrics import metrics
+
+
+class Hedger:
+    """
+    Runs a call and, if it hasn't finished after the `percentile` latency of
+    recent calls, starts an identical backup call. The first successful
+    result wins and the other call is cancelled. Hedging waits for
+    `min_samples` latencies before it kicks in, never fires sooner than
+    `min_delay` seconds, and is capped at `max_extra` backups per call
+    (0.05 = at most 5% extra requests).
+
+    Async callers (run_async) get true cancellation. Threaded callers (run)
+    can't interrupt a blocking HTTP call, so a losing thread finishes in the
+    background and its result is thrown away.
+    """
+
+    def __init__(self, percentile=0.95, max_extra=0.05, window=512, min_samples=20,
+                 min_delay=0.05):
+        self.percentile = percentile
+        self.max_extra = max_extra
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = deque(maxlen=window)
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "over_budget": 0}
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """
+        Seconds to wait before hedging, or None while there are too few samples.
+        """
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def record(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    async def run_async(self, make_call):
+        """
+        Awaits make_call(), hedging with a second make_call() when it runs long.
+        """
+        import asyncio
+
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(make_call())
+        delay = self._start_call()
+        if delay is None:
+            return await self._finish_async(primary, started)
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done or not self._take_budget():
+            return await self._finish_async(primary, started)
+
+        hedge = asyncio.ensure_future(make_call())
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._settle(task is hedge, started, primary.done())
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def run(self, fn):
+        """
+        Calls fn(), hedging with a second fn() when it runs long.
+        """
+        started = time.perf_counter()
+        delay = self._start_call()
+        if delay is None or not self._has_budget():
+            # No backup can be sent, so there's nothing to return early for.
+            result = fn()
+            self.record(time.perf_counter() - started)
+            return result
+
+        # The caller has to be free to take the backup's answer, so both calls
+        # get threads of their own: a shared pool would queue callers behind
+        # each other (and behind losing calls) and count the wait as latency.
+        primary = _start_thread(fn)
+        done, _ = wait({primary}, timeout=delay)
+        if done or not self._take_budget():
+            result = primary.result()
+            self.record(time.perf_counter() - started)
+            return result
+
+        hedge = _start_thread(fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._settle(future is hedge, started, primary.done())
+                    return future.result()    # the other call finishes on its own thread
+                error = error or future.exception()
+        raise error
+
+    def report(self):
+        delay = self.delay()
+        return {**self.stats, "delay_ms": round(delay * 1000, 1) if delay is not None else None}
+
+    def _start_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+        return self.delay()
+
+    def _has_budget(self):
+        with self._lock:
+            return self.stats["hedged"] + 1 <= self.max_extra * self.stats["calls"]
+
+    def _take_budget(self):
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.max_extra * self.stats["calls"]:
+                self.stats["over_budget"] += 1
+                return False
+            self.stats["hedged"] += 1
+        metrics.increment("hedges_fired")
+        return True
+
+    def _settle(self, hedge_won, started, primary_done):
+        # A cancelled primary took at least this long; recording that keeps
+        # the learned tail from shrinking every time a hedge wins.
+        if not (hedge_won and primary_done):
+            self.record(time.perf_counter() - started)
+        if hedge_won:
+            with self._lock:
+                self.stats["hedge_won"] += 1
+            metrics.increment("hedges_won")
+
+    async def _finish_async(self, task, started):
+        result = await task
+        self.record(time.perf_counter() - started)
+        return result
+
+
+def _start_thread(fn):
+    # Runs fn() on a new daemon thread and returns a Future for its result.
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as error:
+            future.set_exception(error)
+
+    threading.Thread(target=target, name="hedge", daemon=True).start()
+    return future
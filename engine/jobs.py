@@ -0,0 +1,324 @@
+# engine/jobs.py
+# Durable SQLite job queue for long recommendation runs
+#
+#   python -m engine.jobs enqueue catalog.csv --run spring
+#   python -m engine.jobs work --run spring          (start as many as you like)
+#   python -m engine.jobs pause --run spring / resume / status / export out.jsonl
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_QUEUE_PATH = os.path.join(".cache", "jobs.db")
+
+
+class JobQueue:
+    """
+    Products waiting for a recommendation, stored in a SQLite file so a
+    crash or restart loses nothing. Workers lease jobs for
+    `visibility_timeout` seconds; a lease that runs out (worker died) puts
+    the job back in the queue. A job that has been leased `max_attempts`
+    times without succeeding is marked failed instead of retried forever.
+    Any number of processes can share one file: leasing is one write
+    transaction, so a job is only ever held by one worker at a time.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, visibility_timeout=300, max_attempts=3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = None
+
+    def enqueue(self, products, run="default"):
+        """
+        Adds product dicts (get_recommendation's arguments) to a run.
+        Returns the number added.
+        """
+        now = time.time()
+        rows = [(run, json.dumps(product, default=_json_default), now) for product in products]
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT INTO jobs (run, payload, status, attempts, updated_at) VALUES (?, ?, 'queued', 0, ?)",
+                    rows
+                )
+                db.execute("INSERT OR IGNORE INTO runs (run, paused) VALUES (?, 0)", (run,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def lease(self, worker, limit=1, run="default"):
+        """
+        Takes up to `limit` jobs for `worker`. Returns [(job_id, product)],
+        empty when nothing is available or the run is paused.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases that already used every attempt are poison, not work.
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired on every attempt', "
+                    "worker = NULL, updated_at = ? "
+                    "WHERE run = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, run, now, self.max_attempts)
+                )
+                if self._paused(db, run):
+                    db.execute("COMMIT")
+                    return []
+                jobs = db.execute(
+                    "SELECT id, payload FROM jobs WHERE run = ? AND "
+                    "(status = 'queued' OR (status = 'leased' AND lease_until < ?)) "
+                    "ORDER BY id LIMIT ?",
+                    (run, now, limit)
+                ).fetchall()
+                db.executemany(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(worker, now + self.visibility_timeout, now, job_id) for job_id, _ in jobs]
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return [(job_id, json.loads(payload)) for job_id, payload in jobs]
+
+    def extend(self, job_id, worker):
+        """
+        Renews a lease. Returns False if the worker no longer holds the job.
+        """
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.visibility_timeout, time.time(), job_id, worker)
+        )
+
+    def complete(self, job_id, worker, result):
+        """
+        Stores a result. Returns False (and stores nothing) if the lease had
+        already run out and the job went to another worker.
+        """
+        return self._update(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, worker = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(result, default=_json_default), time.time(), job_id, worker)
+        )
+
+    def fail(self, job_id, worker, error, retry=True):
+        """
+        Records an error. The job goes back in the queue while it has
+        attempts left and `retry` is set, otherwise it is marked failed.
+        """
+        return self._update(
+            "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END, "
+            "error = ?, worker = NULL, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (retry, self.max_attempts, error, time.time(), job_id, worker)
+        )
+
+    def pause(self, run="default"):
+        self._update("INSERT OR REPLACE INTO runs (run, paused) VALUES (?, 1)", (run,))
+
+    def resume(self, run="default"):
+        self._update("INSERT OR REPLACE INTO runs (run, paused) VALUES (?, 0)", (run,))
+
+    def is_paused(self, run="default"):
+        with self._lock:
+            return self._paused(self._connect(), run)
+
+    def retry_failed(self, run="default"):
+        """
+        Puts every failed job of a run back in the queue with fresh attempts.
+        """
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, updated_at = ? "
+                "WHERE run = ? AND status = 'failed'",
+                (time.time(), run)
+            )
+        return cursor.rowcount
+
+    def counts(self, run="default"):
+        """
+        {"queued": n, "leased": n, "done": n, "failed": n} for a run.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE run = ? GROUP BY status", (run,)
+            ).fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(rows)
+        return counts
+
+    def results(self, run="default"):
+        """
+        Yields {"id", "product", "status", "result", "error"} for every job
+        of a run, in the order they were enqueued.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, payload, status, result, error FROM jobs WHERE run = ? ORDER BY id", (run,)
+            ).fetchall()
+        for job_id, payload, status, result, error in rows:
+            yield {
+                "id": job_id,
+                "product": json.loads(payload),
+                "status": status,
+                "result": json.loads(result) if result is not None else None,
+                "error": error,
+            }
+
+    def _update(self, sql, params):
+        with self._lock:
+            return self._connect().execute(sql, params).rowcount > 0
+
+    def _paused(self, db, run):
+        row = db.execute("SELECT paused FROM runs WHERE run = ?", (run,)).fetchone()
+        return bool(row and row[0])
+
+    def _connect(self):
+        # Autocommit, with explicit transactions where several statements
+        # must land together. WAL lets readers and one writer overlap.
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, run TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL, worker TEXT, lease_until REAL, "
+                "result TEXT, error TEXT, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_run_status ON jobs (run, status, id)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, paused INTEGER NOT NULL)"
+            )
+        return self._db
+
+
+def run_worker(queue, run="default", worker=None, lease_size=32, concurrency=8, poll=1.0):
+    """
+    Leases jobs and answers them with get_recommendations_async until the
+    run is finished or paused. Returns the number of jobs this worker completed.
+    """
+    import asyncio
+    from engine.recommender import get_recommendations_async
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    completed = 0
+    while True:
+        jobs = queue.lease(worker, lease_size, run)
+        if not jobs:
+            counts = queue.counts(run)
+            if queue.is_paused(run) or not (counts["queued"] or counts["leased"]):
+                return completed
+            time.sleep(poll)    # other workers hold the rest; their leases may still expire
+            continue
+
+        # Retries inside get_recommendations_async are kept short; the queue
+        # is the outer retry loop.
+        with _heartbeat(queue, [job_id for job_id, _ in jobs], worker):
+            answers = asyncio.run(get_recommendations_async(
+                [product for _, product in jobs], concurrency=concurrency, max_attempts=2, timeout=60
+            ))
+        for (job_id, _), answer in zip(jobs, answers):
+            if answer["error"] is None:
+                completed += queue.complete(job_id, worker, answer["recommendation"])
+            else:
+                # Permanent errors use up their attempts and end up failed.
+                queue.fail(job_id, worker, answer["error"])
+
+
+@contextmanager
+def _heartbeat(queue, job_ids, worker):
+    # Renews the leases every third of the visibility timeout while a batch
+    # runs, so a slow batch isn't handed to a second worker and paid for twice.
+    # A worker that dies stops renewing and its jobs expire as usual.
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(queue.visibility_timeout / 3):
+            for job_id in job_ids:
+                queue.extend(job_id, worker)
+
+    thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _json_default(value):
+    # NumPy scalars from catalog DataFrames.
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.jobs",
+                                     description="Durable queue for catalog recommendation runs.")
+    parser.add_argument("command", choices=["enqueue", "work", "pause", "resume", "status", "retry", "export"])
+    parser.add_argument("path", nargs="?", help="catalog to enqueue, or .jsonl file to export to")
+    parser.add_argument("--run", default="default", help="name of the run")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="queue database file")
+    parser.add_argument("--lease-size", type=int, default=32, help="jobs leased at a time")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel AI requests per worker")
+    parser.add_argument("--visibility-timeout", type=float, default=300,
+                        help="seconds before an unfinished lease is handed to another worker")
+    parser.add_argument("--max-attempts", type=int, default=3, help="attempts before a job is marked failed")
+    args = parser.parse_args(argv)
+    if args.command in ("enqueue", "export") and not args.path:
+        parser.error(f"{args.command} needs a path")
+    from dotenv import load_dotenv
+    load_dotenv()    # PRICING_* settings from .env, before engine.recommender reads them
+
+    queue = JobQueue(args.queue, args.visibility_timeout, args.max_attempts)
+
+    if args.command == "enqueue":
+        from engine.catalog import analyze_catalog_chunk, product_for_row, read_catalog
+
+        added = 0
+        for chunk in read_catalog(args.path):
+            rows = analyze_catalog_chunk(chunk).to_dict("records")
+            added += queue.enqueue([product_for_row(row) for row in rows], args.run)
+        print(f"Queued {added:,} products in run '{args.run}'", file=sys.stderr)
+    elif args.command == "work":
+        done = run_worker(queue, args.run, lease_size=args.lease_size, concurrency=args.concurrency)
+        print(f"Completed {done:,} jobs", file=sys.stderr)
+    elif args.command == "pause":
+        queue.pause(args.run)
+    elif args.command == "resume":
+        queue.resume(args.run)
+    elif args.command == "retry":
+        print(f"Re-queued {queue.retry_failed(args.run):,} failed jobs", file=sys.stderr)
+    elif args.command == "export":
+        with open(args.path, "w", encoding="utf-8") as file:
+            for job in queue.results(args.run):
+                file.write(json.dumps(job) + "\n")
+
+    counts = queue.counts(args.run)
+    state = "paused" if queue.is_paused(args.run) else "active"
+    print(f"{args.run} ({state}): " + ", ".join(f"{n:,} {status}" for status, n in counts.items()),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
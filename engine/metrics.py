@@ -0,0 +1,177 @@
+# engine/metrics.py
+# Lightweight stage timings and counters for the recommendation path
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from in-process math to slow API calls.
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Metrics:
+    """
+    Per-stage latency histograms plus named counters. Keeps the last
+    `window` samples per stage for p50/p95/p99, so memory stays bounded.
+    Safe to use from threads and asyncio tasks.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._bucket_counts = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+            self._sums = defaultdict(float)
+            self._counts = defaultdict(int)
+            self._samples = defaultdict(lambda: deque(maxlen=self.window))
+            self.counters = defaultdict(int)
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Times the enclosed block as one observation of `stage`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            buckets = self._bucket_counts[stage]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self._sums[stage] += seconds
+            self._counts[stage] += 1
+            self._samples[stage].append(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_usage(self, usage, route=None):
+        """
+        Adds an OpenAI response.usage object to the token counters.
+        cached_tokens is the part of the prompt served from the provider's
+        prompt cache. With a route name (see engine.routing), the tokens are
+        also added to route_<route>_* counters.
+        """
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        counts = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+        }
+        for name, count in counts.items():
+            self.increment(name, count)
+            if route is not None:
+                self.increment(f"route_{route}_{name}", count)
+
+    def summary(self):
+        """
+        Returns {"stages": {stage: count/sum/p50/p95/p99}, "counters": {...}}.
+        """
+        with self._lock:
+            stages = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                stages[stage] = {
+                    "count": self._counts[stage],
+                    "sum_seconds": round(self._sums[stage], 6),
+                    **{f"p{round(q * 100)}_ms": round(_quantile(ordered, q) * 1000, 3) for q in QUANTILES},
+                }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = [
+            "# HELP pricing_stage_seconds Time spent in each recommendation stage.",
+            "# TYPE pricing_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, buckets in self._bucket_counts.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, buckets):
+                    cumulative += count
+                    lines.append(f'pricing_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'pricing_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self._counts[stage]}')
+                lines.append(f'pricing_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]}')
+                lines.append(f'pricing_stage_seconds_count{{stage="{stage}"}} {self._counts[stage]}')
+
+        lines += [
+            "# HELP pricing_stage_recent_seconds Latency quantiles over recent calls.",
+            "# TYPE pricing_stage_recent_seconds gauge",
+        ]
+        for stage, stats in summary["stages"].items():
+            for q in QUANTILES:
+                value = stats[f"p{round(q * 100)}_ms"] / 1000
+                lines.append(f'pricing_stage_recent_seconds{{stage="{stage}",quantile="{q}"}} {value}')
+
+        for name, value in summary["counters"].items():
+            lines.append(f"# TYPE pricing_{name}_total counter")
+            lines.append(f"pricing_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes a snapshot: Prometheus text for .prom/.txt files, otherwise one
+        appended JSON line with a timestamp.
+        """
+        if path.endswith((".prom", ".txt")):
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(self.to_prometheus())
+        else:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"time": time.time(), **self.summary()}) + "\n")
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """
+        Serves /metrics (Prometheus) and /metrics.json from a daemon thread.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, kind = json.dumps(metrics.summary()).encode(), "application/json"
+                else:
+                    body, kind = metrics.to_prometheus().encode(), "text/plain; version=0.0.4"
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+metrics = Metrics()
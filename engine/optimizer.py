@@ -0,0 +1,253 @@
+# engine/optimizer.py
+# Works out a suggested price locally, without calling the AI
+
+import numpy as np
+
+from engine.elasticity import get_margin
+
+GOALS = (
+    "Maximize Profit",
+    "Maximize Sales Volume",
+    "Beat Competitors",
+    "Stay Competitive While Protecting Margin",
+)
+
+MIN_MARGIN = 0.15          # never suggest a price below this margin
+PROTECTED_MARGIN = 0.30    # margin floor for "Stay Competitive While Protecting Margin"
+UNDERCUT = 0.02            # how far below the cheapest competitor "Beat Competitors" goes
+MAX_STEP = 0.25            # biggest single price move we suggest without the AI
+RANGE_WIDTH = 0.03         # suggested range is +/- this around the suggested price
+MIN_CONFIDENCE = 0.7       # below this, callers should ask the AI instead
+MISSING_INPUT = 0.8        # confidence kept per missing input (elasticity, competitor prices)
+ABOVE_MARKET = 0.5         # most confidence in raising past every competitor
+DEFAULT_ELASTICITY = -1.5  # demand assumed by the price grid when a SKU has no estimate
+
+RISKS = {
+    "Maximize Profit": "Sales may drop more than expected if buyers are more price sensitive than past data shows.",
+    "Maximize Sales Volume": "Thin margins leave little room if your costs go up.",
+    "Beat Competitors": "Competitors may match your price, starting a race to the bottom.",
+    "Stay Competitive While Protecting Margin": "Buyers who shop purely on price may still pick cheaper listings.",
+}
+
+
+def recommend_price(your_price, cost, elasticity, competitor_data, goal):
+    """
+    Suggests a price for one product and one of the app's four goals.
+    elasticity is the calculate_elasticity result (may be None) and
+    competitor_data the analyze_competitors result (may be None).
+    Returns a dict with action, suggested_price, price_range, confidence
+    (0-1), margin at the suggested price and a short reason.
+    """
+    if your_price <= 0 or cost <= 0:
+        return None
+
+    floor = cost / (1 - MIN_MARGIN)
+    confidence = 1.0
+
+    if goal == "Maximize Profit":
+        target, confidence, reason = _profit_price(your_price, cost, elasticity, competitor_data)
+    elif goal == "Maximize Sales Volume":
+        target = floor
+        if competitor_data:
+            target = max(floor, min(your_price, competitor_data["lowest_competitor"]))
+        if target == floor:
+            reason = f"This is the lowest price that still keeps a {round(MIN_MARGIN * 100)}% margin."
+        elif target >= your_price:
+            reason = "You are already at or below the cheapest competitor, so there is no need to go lower."
+        else:
+            reason = "This matches the cheapest competitor while keeping a healthy margin."
+    elif goal == "Beat Competitors":
+        if not competitor_data:
+            target, confidence = your_price, 0.3
+            reason = "Without competitor prices there is nothing to beat yet."
+        else:
+            target = competitor_data["lowest_competitor"] * (1 - UNDERCUT)
+            reason = "This undercuts the cheapest competitor you entered."
+            if target < floor:
+                target, confidence = floor, 0.4
+                reason = "You can't undercut the cheapest competitor without giving up your margin."
+    elif goal == "Stay Competitive While Protecting Margin":
+        floor = cost / (1 - PROTECTED_MARGIN)
+        if not competitor_data:
+            target, confidence = max(your_price, floor), 0.5
+            reason = f"This keeps at least a {round(PROTECTED_MARGIN * 100)}% margin."
+        else:
+            target = max(competitor_data["avg_competitor_price"], floor)
+            reason = "This sits at the market average while protecting your margin."
+            if target > competitor_data["highest_competitor"]:
+                confidence = 0.5
+                reason = "Protecting your margin puts you above every competitor."
+    else:
+        return None
+
+    # Missing inputs mean guessing; raising past every competitor needs more
+    # judgement than this model has. Both are better left to the AI.
+    confidence *= MISSING_INPUT ** ((elasticity is None) + (not competitor_data))
+    if competitor_data and target > your_price and target > competitor_data["highest_competitor"]:
+        confidence = min(confidence, ABOVE_MARKET)
+
+    # Big jumps are where the simple model is least trustworthy.
+    low_step, high_step = your_price * (1 - MAX_STEP), your_price * (1 + MAX_STEP)
+    if target < low_step or target > high_step:
+        target = min(max(target, low_step), high_step)
+        confidence *= 0.6
+        reason += " The move is capped for now; revisit after you see how buyers react."
+
+    target = round(float(max(target, floor)), 2)
+    low = round(max(target * (1 - RANGE_WIDTH), floor), 2)
+    high = round(target * (1 + RANGE_WIDTH), 2)
+
+    if target > your_price * 1.01:
+        action = "raise"
+    elif target < your_price * 0.99:
+        action = "lower"
+    else:
+        action = "hold"
+
+    return {
+        "action": action,
+        "suggested_price": target,
+        "price_range": (low, high),
+        "margin": get_margin(target, cost),
+        "confidence": round(confidence, 2),
+        "reason": reason,
+        "risk": RISKS[goal],
+    }
+
+
+def _profit_price(your_price, cost, elasticity, competitor_data):
+    """
+    Profit-maximizing price under constant-elasticity demand.
+    Returns (price, confidence, reason).
+    """
+    if elasticity is None:
+        return your_price, 0.3, "There isn't enough price history to estimate demand."
+    if elasticity > 0:
+        # Sales rose with price: something other than price moved demand.
+        return your_price, 0.3, "Your sales history doesn't show a clear price effect."
+
+    if elasticity < -1:
+        # Markup rule: p* = cost * e / (1 + e)
+        target = cost * elasticity / (1 + elasticity)
+        confidence = 0.9
+        reason = "Based on how your buyers reacted to past price changes, this price balances margin and sales."
+    else:
+        # Inelastic demand: profit keeps rising with price, so step up toward the market ceiling.
+        target = your_price * (1 + MAX_STEP)
+        confidence = 0.75
+        reason = "Your buyers barely reacted to past price changes, so there is room to raise."
+        if competitor_data and competitor_data["highest_competitor"] > your_price:
+            target = min(target, competitor_data["highest_competitor"])
+        elif competitor_data:
+            reason = ("Your buyers barely reacted to past price changes, "
+                      "but you are already priced above every competitor.")
+
+    return target, confidence, reason
+
+
+def format_price_recommendation(result):
+    """
+    Turns a recommend_price result into the same kind of plain-English text the AI writes.
+    """
+    low, high = result["price_range"]
+    if result["action"] == "hold":
+        headline = f"Hold your price at around ${result['suggested_price']:.2f}"
+    else:
+        headline = f"{result['action'].title()} your price to ${result['suggested_price']:.2f}"
+
+    return (
+        f"{headline} (a good range is ${low:.2f}–${high:.2f}), "
+        f"which gives you a {result['margin']}% margin. "
+        f"{result['reason']}\n\nRisk to watch: {result['risk']}"
+    )
+
+
+def optimize_price_grid(your_price, cost, units, elasticity, goal,
+                        avg_competitor=None, lowest_competitor=None,
+                        n_candidates=200, span=0.5, min_margin=MIN_MARGIN,
+                        max_gap_percent=None, memory_budget=256 * 2**20):
+    """
+    Searches a grid of candidate prices for every SKU at once.
+    Each SKU gets n_candidates prices from (1 - span) to (1 + span) times its
+    current price; units follow constant-elasticity demand
+    units * (candidate / your_price) ** elasticity, and the best candidate is
+    picked for the goal subject to a minimum margin and, optionally, a maximum
+    % gap to the competitor average. NaN elasticities use DEFAULT_ELASTICITY;
+    NaN competitor stats mean no competitor constraint for that SKU.
+    Work is done in chunks of SKUs sized so the SKUs x candidates arrays stay
+    within memory_budget bytes.
+    Returns a dict of arrays: price, units, revenue, profit, margin (%) and
+    feasible (False where no candidate met the constraints).
+    """
+    if goal not in GOALS:
+        raise ValueError(f"Unknown goal: {goal}")
+
+    your_price = np.asarray(your_price, dtype=np.float64)
+    size = len(your_price)
+    cost = np.broadcast_to(np.asarray(cost, dtype=np.float64), size)
+    units = np.broadcast_to(np.asarray(units, dtype=np.float64), size)
+    elasticity = np.asarray(elasticity, dtype=np.float64)
+    elasticity = np.broadcast_to(np.where(np.isnan(elasticity), DEFAULT_ELASTICITY, elasticity), size)
+    avg_competitor = _optional_column(avg_competitor, size)
+    lowest_competitor = _optional_column(lowest_competitor, size)
+
+    if goal == "Stay Competitive While Protecting Margin":
+        min_margin = max(min_margin, PROTECTED_MARGIN)
+
+    steps = np.linspace(1 - span, 1 + span, n_candidates)
+    log_steps = np.log(steps)
+
+    result = {name: np.full(size, np.nan) for name in ("price", "units", "revenue", "profit", "margin")}
+    result["feasible"] = np.zeros(size, dtype=bool)
+
+    # Up to eight SKUs x candidates arrays are alive at once inside a chunk.
+    chunk = max(1, int(memory_budget // (n_candidates * 8 * 8)))
+    for start in range(0, size, chunk):
+        rows = slice(start, min(start + chunk, size))
+        _search_chunk(
+            result, rows, goal, steps, log_steps, your_price[rows], cost[rows],
+            units[rows], elasticity[rows], avg_competitor[rows],
+            lowest_competitor[rows], min_margin, max_gap_percent
+        )
+    return result
+
+
+def _search_chunk(result, rows, goal, steps, log_steps, your_price, cost, units,
+                  elasticity, avg_competitor, lowest_competitor, min_margin,
+                  max_gap_percent):
+    prices = your_price[:, None] * steps
+    demand = np.exp(elasticity[:, None] * log_steps)
+    demand *= units[:, None]
+    profit = prices - cost[:, None]
+    profit *= demand
+
+    feasible = prices * (1 - min_margin) >= cost[:, None]
+    if max_gap_percent is not None:
+        gap = np.abs(prices - avg_competitor[:, None])
+        with np.errstate(invalid="ignore"):
+            feasible &= ~(gap > avg_competitor[:, None] * (max_gap_percent / 100))
+    if goal == "Beat Competitors":
+        with np.errstate(invalid="ignore"):
+            feasible &= ~(prices > lowest_competitor[:, None] * (1 - UNDERCUT))
+
+    score = demand if goal == "Maximize Sales Volume" else profit
+    score = np.where(feasible, score, -np.inf)
+    best = np.argmax(score, axis=1)
+    picked = np.arange(len(best)), best
+
+    price = prices[picked]
+    result["price"][rows] = np.round(price, 2)
+    result["units"][rows] = demand[picked]
+    result["revenue"][rows] = price * demand[picked]
+    result["profit"][rows] = profit[picked]
+    result["margin"][rows] = np.round((price - cost) / price * 100, 2)
+    result["feasible"][rows] = feasible[picked]
+
+    for name in ("price", "units", "revenue", "profit", "margin"):
+        result[name][rows] = np.where(result["feasible"][rows], result[name][rows], np.nan)
+
+
+def _optional_column(values, size):
+    if values is None:
+        return np.full(size, np.nan)
+    return np.broadcast_to(np.asarray(values, dtype=np.float64), size)
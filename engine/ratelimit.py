@@ -0,0 +1,204 @@
+# engine/ratelimit.py
+# Client-side RPM/TPM limits with adaptive concurrency for OpenAI calls
+
+import math
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from engine.metrics import metrics
+
+POLL = 0.02             # seconds between checks while waiting for a free slot
+DECREASE_COOLDOWN = 1.0 # 429s within this window of a decrease count as the same event
+
+
+def estimate_tokens(request):
+    """
+    Tokens a chat completion request counts against TPM: the prompt at
+    ~4 characters per token plus a few per message, plus max_tokens, which
+    the API reserves up front.
+    """
+    prompt = sum(math.ceil(len(message.get("content") or "") / 4) + 4 for message in request["messages"])
+    return prompt + (request.get("max_tokens") or 0)
+
+
+class RateLimiter:
+    """
+    Keeps requests under a requests-per-minute and tokens-per-minute budget
+    with two token buckets, and caps requests in flight with an AIMD limit:
+    +1/limit per successful response, halved on a 429. Limits left as None
+    are learned from the x-ratelimit-* response headers, and the buckets are
+    lowered whenever the API reports less remaining than they hold.
+    Usable from threads (limit) and asyncio tasks (limit_async) at once.
+    """
+
+    def __init__(self, rpm=None, tpm=None, concurrency=8, min_concurrency=1, max_concurrency=64):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "waited": 0, "rate_limited": 0, "decreases": 0}
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def limit(self, tokens):
+        """
+        Holds a slot for one request of about `tokens` tokens, waiting for one first.
+        """
+        started = time.perf_counter()
+        while True:
+            delay = self._try_acquire(tokens)
+            if not delay:
+                break
+            time.sleep(delay)
+        self._record_wait(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def limit_async(self, tokens):
+        import asyncio
+
+        started = time.perf_counter()
+        while True:
+            delay = self._try_acquire(tokens)
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+        self._record_wait(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def observe(self, status_code, headers):
+        """
+        Feeds one HTTP response to the limiter (see engine.transport hooks).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            rpm = _learned(self.rpm, headers.get("x-ratelimit-limit-requests"))
+            tpm = _learned(self.tpm, headers.get("x-ratelimit-limit-tokens"))
+            if rpm and not self.rpm:
+                self._requests = rpm    # newly learned limits start with a full bucket
+            if tpm and not self.tpm:
+                self._tokens = tpm
+            self.rpm, self.tpm = rpm, tpm
+            remaining_requests = _number(headers.get("x-ratelimit-remaining-requests"))
+            remaining_tokens = _number(headers.get("x-ratelimit-remaining-tokens"))
+            if self.rpm and remaining_requests is not None:
+                self._requests = min(self._requests, remaining_requests)
+            if self.tpm and remaining_tokens is not None:
+                self._tokens = min(self._tokens, remaining_tokens)
+
+            if status_code == 429:
+                self.stats["rate_limited"] += 1
+                retry_after = _retry_after(headers)
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                if now - self._last_decrease > DECREASE_COOLDOWN:
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                    self._last_decrease = now
+                    self.stats["decreases"] += 1
+            elif status_code < 400:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        if status_code == 429:
+            metrics.increment("rate_limited")
+
+    def report(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                **self.stats,
+                "concurrency": round(self.concurrency, 2),
+                "in_flight": self.in_flight,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "requests_available": round(self._requests, 1) if self.rpm else None,
+                "tokens_available": round(self._tokens) if self.tpm else None,
+            }
+
+    def _try_acquire(self, tokens):
+        # 0 when admitted, otherwise how long to wait before trying again.
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.in_flight >= int(self.concurrency):
+                return POLL
+            delays = []
+            if self.rpm and self._requests < 1:
+                delays.append((1 - self._requests) * 60 / self.rpm)
+            if self.tpm:
+                needed = min(tokens, self.tpm)    # a request bigger than the budget waits for a full bucket
+                if self._tokens < needed:
+                    delays.append((needed - self._tokens) * 60 / self.tpm)
+            if delays:
+                return max(POLL, max(delays))
+
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= min(tokens, self.tpm)
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return 0
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _refill(self, now):
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _record_wait(self, seconds):
+        if seconds > POLL / 2:
+            with self._lock:
+                self.stats["waited"] += 1
+            metrics.observe("rate_limit_wait", seconds)
+
+
+def _learned(configured, header):
+    limit = _number(header)
+    if limit is None:
+        return configured
+    return min(configured, limit) if configured else limit
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_after(headers):
+    # retry-after-ms, then retry-after in seconds, then a reset like "1.5s" or "6m0s".
+    milliseconds = _number(headers.get("retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000
+    seconds = _number(headers.get("retry-after"))
+    if seconds is not None:
+        return seconds
+    return _duration(headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset-tokens")) or 1.0
+
+
+def _duration(text):
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", text or "")
+    return sum(float(number) * {"h": 3600, "m": 60, "s": 1, "ms": 0.001}[unit] for number, unit in parts)
@@ -1,55 +1,195 @@
 # engine/recommender.py
 # Builds the prompt and calls the OpenAI API
 
-from openai import OpenAI
-from dotenv import load_dotenv
-import streamlit as st
+import contextlib
+import json
 import os
+import sys
+import threading
+import time
 
-load_dotenv()
+from engine.cache import (DEFAULT_CACHE_PATH, RecommendationCache, SimilarityCache, make_cache_key,
+                          prompt_inputs)
+from engine.coalesce import AsyncSingleFlight, LeaderGone, SingleFlight
+from engine.metrics import metrics
+from engine.routing import ModelRouter
 
-try:
-    api_key = st.secrets["OPENAI_API_KEY"]
-except:
-    api_key = os.getenv("OPENAI_API_KEY")
+# The OpenAI SDK, dotenv and Streamlit secrets are only touched on the first
+# API call, so importing this module stays cheap and free of I/O.
+_client = None
+_http_client = None
+_async_clients = {}    # event loop -> (AsyncOpenAI, httpx.AsyncClient)
+_async_users = {}      # event loop -> async calls currently using its client
+_client_lock = threading.Lock()
 
-client = OpenAI(api_key=api_key)
 
-def build_prompt(product_name, category, your_price, cost, units_sold,
-                 elasticity_label, margin, competitor_data, goal):
+def get_api_key():
     """
-    Assembles all the pricing data into a structured prompt for the AI.
+    Reads the key from Streamlit secrets when running inside the app,
+    otherwise from the environment or a .env file.
     """
+    from dotenv import load_dotenv
+    load_dotenv()
 
-    comp_summary = ""
-    if competitor_data:
-        comp_summary = f"""
-Competitor Pricing:
-- Average competitor price: ${competitor_data['avg_competitor_price']}
-- Lowest competitor price: ${competitor_data['lowest_competitor']}
-- Highest competitor price: ${competitor_data['highest_competitor']}
-- Your price vs market: {competitor_data['price_gap_percent']}% ({competitor_data['position']})
-"""
-    else:
-        comp_summary = "No competitor data provided."
+    if "streamlit" in sys.modules:
+        import streamlit as st
+        try:
+            return st.secrets["OPENAI_API_KEY"]
+        except Exception:
+            pass
+    return os.getenv("OPENAI_API_KEY")
 
-    prompt = f"""
-You are an expert pricing strategist helping an independent seller make smart pricing decisions.
 
-Here is the data about their product:
+def get_client():
+    """
+    Shared OpenAI client, built on first use. Safe to call from any thread;
+    all threads share one connection pool (see engine.transport).
+    Retries are handled by _with_retries, so the SDK's own are off.
+    """
+    global _client, _http_client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                from engine.transport import build_http_client, http_timeout
+                _http_client = build_http_client(on_response=_observe_response)
+                _client = OpenAI(api_key=get_api_key(), http_client=_http_client,
+                                 timeout=http_timeout(), max_retries=0)
+    return _client
+
 
-Product: {product_name}
-Category: {category}
-Current Price: ${your_price}
-Cost to Produce/Source: ${cost}
-Profit Margin: {margin}%
-Units Sold Per Month: {units_sold}
-Price Sensitivity: {elasticity_label}
-Seller Goal: {goal}
+def get_async_client():
+    """
+    AsyncOpenAI client for the running event loop, built on first use.
+    Its connections belong to one loop, so each loop gets its own pool,
+    closed when the last get_*_async call running on the loop finishes.
+    Retries are handled by get_recommendations_async, so the SDK's own are off.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        from openai import AsyncOpenAI
+        from engine.transport import build_async_http_client, http_timeout
+        http_client = build_async_http_client(on_response=_observe_response)
+        async_client = AsyncOpenAI(api_key=get_api_key(), http_client=http_client,
+                                   timeout=http_timeout(), max_retries=0)
+        clients = _async_clients[loop] = (async_client, http_client)
+    return clients[0]
+
+
+@contextlib.asynccontextmanager
+async def _async_client_session():
+    # Keeps the loop's client open while at least one call uses it. Callers
+    # that asyncio.run() per chunk would otherwise leave a pool of open
+    # sockets behind for every loop they ran.
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    _async_users[loop] = _async_users.get(loop, 0) + 1
+    try:
+        yield
+    finally:
+        _async_users[loop] -= 1
+        if not _async_users[loop]:
+            del _async_users[loop]
+            clients = _async_clients.pop(loop, None)
+            if clients is not None:
+                await clients[1].aclose()
+
+
+def configure_client(**settings):
+    """
+    Changes the connection pool settings (see engine.transport.DEFAULT_HTTP_SETTINGS)
+    and closes the current clients, so the next call builds them with the new pool.
+    Call it between runs: requests still in flight on the old clients fail.
+    """
+    global _client, _http_client
+    import asyncio
+    from engine.transport import configure_http
 
-{comp_summary}
+    with _client_lock:
+        configure_http(**settings)
+        if _http_client is not None:
+            _http_client.close()
+        _client = _http_client = None
+        for loop, (_, http_client) in list(_async_clients.items()):
+            # Async pools can only be closed on their own loop.
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(http_client.aclose(), loop)
+            elif not loop.is_closed():
+                loop.run_until_complete(http_client.aclose())
+        _async_clients.clear()
 
-Based on this data, provide a clear and actionable pricing recommendation. Include:
+
+def client_pool_stats():
+    """
+    Pool utilization of the shared sync client and of the async client for
+    the running event loop (None for clients not built yet).
+    """
+    from engine.transport import pool_stats
+
+    stats = {"sync": pool_stats(_http_client) if _http_client is not None else None, "async": None}
+    try:
+        import asyncio
+        clients = _async_clients.get(asyncio.get_running_loop())
+    except RuntimeError:
+        clients = None
+    if clients is not None:
+        stats["async"] = pool_stats(clients[1])
+    return stats
+
+
+MODEL = "gpt-4o"
+TEMPERATURE = 0.7
+MAX_TOKENS = 400
+FAST_MODEL = "gpt-4o-mini"
+FAST_MAX_TOKENS = 250
+MAX_ATTEMPTS = 3          # sync calls: the first try plus the SDK's usual two retries
+RETRY_BACKOFF = 0.5       # retries wait a random 0-0.5 s, 0-1 s, 0-2 s, ...
+RETRY_MAX_WAIT = 20       # ... up to this many seconds
+SYSTEM_MESSAGE = "You are a helpful pricing strategist for small business owners."
+
+recommendation_cache = RecommendationCache(os.getenv("PRICING_CACHE_PATH", DEFAULT_CACHE_PATH))
+# Opt-in (PRICING_SIMILARITY_CACHE=1): near-identical products reuse a re-templated
+# answer. Figures it doesn't template, like units sold, carry over from the other product.
+similarity_cache = SimilarityCache() if os.getenv("PRICING_SIMILARITY_CACHE") == "1" else None
+# Optional RPM/TPM budget with adaptive concurrency, e.g. PRICING_RPM=500 PRICING_TPM=30000.
+# Assign a RateLimiter (or None) to change it at runtime.
+rate_limiter = None
+if os.getenv("PRICING_RPM") or os.getenv("PRICING_TPM"):
+    from engine.ratelimit import RateLimiter
+    rate_limiter = RateLimiter(
+        rpm=float(os.getenv("PRICING_RPM") or 0) or None,
+        tpm=float(os.getenv("PRICING_TPM") or 0) or None,
+    )
+
+# Clear-cut cases go to FAST_MODEL, ambiguous ones to MODEL (see engine.routing).
+# PRICING_ROUTING=0 sends everything to MODEL; assign a ModelRouter to change the policy.
+router = None
+if os.getenv("PRICING_ROUTING", "1") != "0":
+    router = ModelRouter({
+        "fast": {"model": FAST_MODEL, "max_tokens": FAST_MAX_TOKENS},
+        "full": {"model": MODEL, "max_tokens": MAX_TOKENS},
+    })
+
+# Opt-in hedging of slow non-streaming calls (PRICING_HEDGE=1, or assign a Hedger).
+hedger = None
+if os.getenv("PRICING_HEDGE") == "1":
+    from engine.hedge import Hedger
+    hedger = Hedger()
+
+# Concurrent callers asking about the same product share one API call.
+_flight = SingleFlight()
+_async_flight = AsyncSingleFlight()
+
+
+# Everything before the product data is identical for every request, so the
+# provider can serve it from its prompt cache. Keep variable text out of it.
+PROMPT_INSTRUCTIONS = """You are an expert pricing strategist helping an independent seller make smart pricing decisions.
+
+Based on the product data below, provide a clear and actionable pricing recommendation. Include:
 1. Whether they should raise, lower, or hold their price
 2. A specific suggested price or price range
 3. A plain-English explanation of why (2-3 sentences max)
@@ -57,27 +197,566 @@ Based on this data, provide a clear and actionable pricing recommendation. Inclu
 
 Keep your response friendly, concise, and practical. You are talking directly to a small business owner.
 """
+
+
+def build_prompt(product_name, category, your_price, cost, units_sold,
+                 elasticity_label, margin, competitor_data, goal):
+    """
+    Assembles all the pricing data into a structured prompt for the AI.
+    The fixed instructions come first and the product data last.
+    """
+    inputs = prompt_inputs(product_name, category, your_price, cost, units_sold,
+                           elasticity_label, margin, competitor_data, goal)
+    competitors = inputs["competitor_data"]
+
+    comp_summary = ""
+    if competitors:
+        comp_summary = f"""Competitor Pricing:
+- Average competitor price: ${competitors['avg_competitor_price']}
+- Lowest competitor price: ${competitors['lowest_competitor']}
+- Highest competitor price: ${competitors['highest_competitor']}
+- Your price vs market: {competitors['price_gap_percent']}% ({competitors['position']})
+"""
+    else:
+        comp_summary = "No competitor data provided.\n"
+
+    prompt = f"""{PROMPT_INSTRUCTIONS}
+Here is the data about their product:
+
+Product: {inputs['product_name']}
+Category: {inputs['category']}
+Current Price: ${inputs['your_price']}
+Cost to Produce/Source: ${inputs['cost']}
+Profit Margin: {inputs['margin']}%
+Units Sold Per Month: {inputs['units_sold']}
+Price Sensitivity: {inputs['elasticity_label']}
+Seller Goal: {inputs['goal']}
+
+{comp_summary}"""
     return prompt
 
 
 def get_recommendation(product_name, category, your_price, cost, units_sold,
-                       elasticity_label, margin, competitor_data, goal):
+                       elasticity_label, margin, competitor_data, goal, use_cache=True):
     """
     Sends the prompt to OpenAI and returns the recommendation.
+    Identical inputs are answered from recommendation_cache when use_cache is on.
+    """
+    product = {
+        "product_name": product_name, "category": category, "your_price": your_price,
+        "cost": cost, "units_sold": units_sold, "elasticity_label": elasticity_label,
+        "margin": margin, "competitor_data": competitor_data, "goal": goal,
+    }
+    route, model, max_tokens = _route(product)
+    if use_cache:
+        cache_key = make_cache_key(**product, model=model, temperature=TEMPERATURE)
+        cached = _cached_recommendation(cache_key, product, model)
+        if cached is not None:
+            return cached
+
+    def request():
+        with metrics.span("build_prompt"):
+            prompt = build_prompt(
+                product_name, category, your_price, cost, units_sold,
+                elasticity_label, margin, competitor_data, goal
+            )
+
+        request = build_request(prompt, model, max_tokens)
+
+        def call():
+            with metrics.span("llm_call"), _route_span(route):
+                return hedger.run(lambda: _create(request)) if hedger else _create(request)
+
+        response = _with_retries(call)
+        metrics.record_usage(response.usage, route)
+
+        recommendation = response.choices[0].message.content
+        if use_cache:
+            _store_recommendation(cache_key, product, recommendation, model)
+        return recommendation
+
+    # Identical requests already in flight on other threads are joined, not repeated.
+    return _flight.do(cache_key, request) if use_cache else request()
+
+
+def get_fast_recommendation(product_name, category, your_price, cost, units_sold,
+                            elasticity, margin, competitor_data, goal,
+                            min_confidence=None):
     """
-    prompt = build_prompt(
+    Answers locally with recommend_price when it is confident enough and only
+    falls back to get_recommendation otherwise. Takes the numeric elasticity
+    (from calculate_elasticity) rather than its label.
+    Returns (recommendation_text, source) where source is "local" or "ai".
+    """
+    # Imported here so workers that only call the AI don't load NumPy.
+    from engine.elasticity import interpret_elasticity
+    from engine.optimizer import MIN_CONFIDENCE, format_price_recommendation, recommend_price
+
+    if min_confidence is None:
+        min_confidence = MIN_CONFIDENCE
+
+    result = recommend_price(your_price, cost, elasticity, competitor_data, goal)
+    if result is not None and result["confidence"] >= min_confidence:
+        return format_price_recommendation(result), "local"
+
+    recommendation = get_recommendation(
         product_name, category, your_price, cost, units_sold,
-        elasticity_label, margin, competitor_data, goal
+        interpret_elasticity(elasticity), margin, competitor_data, goal
     )
+    return recommendation, "ai"
+
+
+def stream_recommendation(product_name, category, your_price, cost, units_sold,
+                          elasticity_label, margin, competitor_data, goal, use_cache=True):
+    """
+    Same as get_recommendation, but yields the text piece by piece as the
+    model writes it. A cached answer is yielded in one piece.
+    """
+    product = {
+        "product_name": product_name, "category": category, "your_price": your_price,
+        "cost": cost, "units_sold": units_sold, "elasticity_label": elasticity_label,
+        "margin": margin, "competitor_data": competitor_data, "goal": goal,
+    }
+    route, model, max_tokens = _route(product)
+    if use_cache:
+        cache_key = make_cache_key(**product, model=model, temperature=TEMPERATURE)
+        cached = _cached_recommendation(cache_key, product, model)
+        if cached is not None:
+            yield cached
+            return
+        # Someone else is already asking: wait for their full answer, or
+        # ask ourselves if they go away before it arrives.
+        while True:
+            flight, leader = _flight.begin(cache_key)
+            if leader:
+                break
+            try:
+                recommendation = flight.result()
+            except LeaderGone:
+                continue
+            yield recommendation
+            return
+
+    try:
+        recommendation = yield from _stream_answer(product, route, model, max_tokens)
+    except BaseException as error:
+        if use_cache:
+            _flight.finish(cache_key, flight, error=error)
+        raise
+
+    # Only a stream that ran to the end is worth caching.
+    if use_cache:
+        _store_recommendation(cache_key, product, recommendation, model)
+        _flight.finish(cache_key, flight, recommendation)
+
+
+def _stream_answer(product, route, model, max_tokens):
+    # Yields the model's text as it arrives and returns it in full.
+    with metrics.span("build_prompt"):
+        prompt = build_prompt(**product)
+
+    request = build_request(prompt, model, max_tokens)
+    with _rate_limit(request):
+        # llm_first_token is time to the first piece of text; llm_call is the
+        # whole stream, excluding time the caller spends between pieces.
+        started = time.perf_counter()
+        waited = 0.0
+        parts = []
+        stream = _with_retries(lambda: get_client().chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        ))
+        for chunk in stream:
+            if chunk.usage is not None:
+                metrics.record_usage(chunk.usage, route)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    metrics.observe("llm_first_token", time.perf_counter() - started)
+                parts.append(chunk.choices[0].delta.content)
+                paused = time.perf_counter()
+                yield parts[-1]
+                waited += time.perf_counter() - paused
+        elapsed = time.perf_counter() - started - waited
+        metrics.observe("llm_call", elapsed)
+        if route is not None:
+            metrics.observe(f"llm_call_{route}", elapsed)
+    return "".join(parts)
+
+
+def _route(product):
+    # (route name, model, max_tokens); the route is None when routing is off.
+    if router is None:
+        return None, MODEL, MAX_TOKENS
+    name, settings = router.route(product)
+    return name, settings["model"], settings["max_tokens"]
+
+
+def _route_span(route):
+    # llm_call times every call; llm_call_<route> splits it by route.
+    if route is None:
+        return contextlib.nullcontext()
+    return metrics.span(f"llm_call_{route}")
+
+
+def _create(request):
+    with _rate_limit(request):
+        return get_client().chat.completions.create(**request)
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a helpful pricing strategist for small business owners."},
+
+def _with_retries(call):
+    # The sync counterpart of _complete_async's retry loop.
+    from tenacity import Retrying
+
+    for attempt in Retrying(**_retry_policy(MAX_ATTEMPTS)):
+        with attempt:
+            return call()
+
+
+def _retry_policy(max_attempts):
+    # Jittered backoff on retryable errors, each retry counted in the "retries" metric.
+    from tenacity import retry_if_exception, stop_after_attempt, wait_random_exponential
+
+    return {
+        "retry": retry_if_exception(is_retryable),
+        "wait": wait_random_exponential(multiplier=RETRY_BACKOFF, max=RETRY_MAX_WAIT),
+        "stop": stop_after_attempt(max_attempts),
+        "before_sleep": lambda state: metrics.increment("retries"),
+        "reraise": True,
+    }
+
+
+def _observe_response(response):
+    if rate_limiter is not None:
+        rate_limiter.observe(response.status_code, response.headers)
+
+
+def _rate_limit(request):
+    if rate_limiter is None:
+        return contextlib.nullcontext()
+    from engine.ratelimit import estimate_tokens
+    return rate_limiter.limit(estimate_tokens(request))
+
+
+def _rate_limit_async(request):
+    if rate_limiter is None:
+        return contextlib.nullcontext()
+    from engine.ratelimit import estimate_tokens
+    return rate_limiter.limit_async(estimate_tokens(request))
+
+
+def _cached_recommendation(cache_key, product, model=MODEL):
+    with metrics.span("cache_lookup"):
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            metrics.increment("cache_hits")
+            return cached
+        if similarity_cache is not None:
+            cached = similarity_cache.get(product, model, TEMPERATURE)
+            if cached is not None:
+                metrics.increment("similar_cache_hits")
+                return cached
+    metrics.increment("cache_misses")
+    return None
+
+
+def _store_recommendation(cache_key, product, recommendation, model=MODEL):
+    recommendation_cache.set(cache_key, recommendation)
+    if similarity_cache is not None:
+        similarity_cache.set(product, model, TEMPERATURE, recommendation)
+
+
+def build_request(prompt, model=MODEL, max_tokens=MAX_TOKENS):
+    """
+    Chat completion arguments shared by the sync and async paths.
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.7,
-        max_tokens=400
-    )
+        "temperature": TEMPERATURE,
+        "max_tokens": max_tokens,
+    }
+
+
+def is_retryable(error):
+    """
+    Rate limits, server errors, timeouts and dropped connections are worth retrying.
+    """
+    from openai import APIConnectionError, APITimeoutError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (APIConnectionError, APITimeoutError, TimeoutError))
+
+
+async def get_recommendations_async(products, concurrency=8, timeout=60, max_attempts=4,
+                                    use_cache=True):
+    """
+    Gets recommendations for many products at once.
+    Each product is a dict of get_recommendation's arguments. At most
+    `concurrency` requests are in flight; each attempt is cut off after
+    `timeout` seconds and retried with jittered backoff on 429/5xx.
+    Returns one {"recommendation": ..., "error": ...} dict per product,
+    in the same order as `products`.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(product):
+        try:
+            recommendation = await _get_recommendation_async(
+                product, semaphore, timeout, max_attempts, use_cache
+            )
+            return {"recommendation": recommendation, "error": None}
+        except Exception as error:
+            return {"recommendation": None, "error": f"{type(error).__name__}: {error}"}
+
+    async with _async_client_session():
+        return await asyncio.gather(*(run_one(product) for product in products))
+
+
+async def _get_recommendation_async(product, semaphore, timeout, max_attempts, use_cache):
+    route, model, max_tokens = _route(product)
+    if use_cache:
+        cache_key = make_cache_key(**product, model=model, temperature=TEMPERATURE)
+        cached = _cached_recommendation(cache_key, product, model)
+        if cached is not None:
+            return cached
+
+    async def request():
+        with metrics.span("build_prompt"):
+            prompt_request = build_request(build_prompt(**product), model, max_tokens)
+        response = await _complete_async(prompt_request, semaphore, timeout, max_attempts, route)
+
+        recommendation = response.choices[0].message.content
+        if use_cache:
+            _store_recommendation(cache_key, product, recommendation, model)
+        return recommendation
+
+    return await _async_flight.do(cache_key, request) if use_cache else await request()
+
+
+async def _complete_async(request, semaphore, timeout, max_attempts, route=None):
+    import asyncio
+    from tenacity import AsyncRetrying
+
+    async_client = get_async_client()
+
+    async def create():
+        async with _rate_limit_async(request):
+            return await asyncio.wait_for(async_client.chat.completions.create(**request), timeout)
+
+    async with semaphore:
+        async for attempt in AsyncRetrying(**_retry_policy(max_attempts)):
+            with attempt, metrics.span("llm_call"), _route_span(route):
+                response = await (hedger.run_async(create) if hedger else create())
+    metrics.record_usage(response.usage, route)
+    return response
+
+
+# ── Batched prompts ──
+# Many products per request: the instructions are sent once, products go in
+# as compact table rows and the answer comes back as schema-checked JSON.
+BATCH_SIZE = 25
+BATCH_TOKENS_PER_PRODUCT = 120
+BATCH_COLUMNS = ("id", "product", "category", "price", "cost", "margin%", "units/mo",
+                 "sensitivity", "goal", "comp_avg", "comp_low", "comp_high", "gap%")
+BATCH_ACTIONS = ("raise", "lower", "hold")
+
+BATCH_INSTRUCTIONS = """You are an expert pricing strategist helping independent sellers make smart pricing decisions.
+
+Each row of the product table is one product. Prices are in dollars, "sensitivity" is how price-sensitive buyers are, \
+"gap%" is the seller's price vs the competitor average and "-" means no data.
+
+Return one recommendation for every row, using the row's id:
+- action: raise, lower or hold
+- suggested_price, with a good price_low to price_high range around it
+- reason: why, in 1-2 plain-English sentences written to the small business owner
+- risk: one risk to watch out for
+"""
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pricing_recommendations",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["recommendations"],
+            "properties": {
+                "recommendations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["id", "action", "suggested_price", "price_low",
+                                     "price_high", "reason", "risk"],
+                        "properties": {
+                            "id": {"type": "string"},
+                            "action": {"type": "string", "enum": list(BATCH_ACTIONS)},
+                            "suggested_price": {"type": "number"},
+                            "price_low": {"type": "number"},
+                            "price_high": {"type": "number"},
+                            "reason": {"type": "string"},
+                            "risk": {"type": "string"},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def build_batch_prompt(products):
+    """
+    One prompt for several products: the fixed instructions, then a
+    "|"-separated table with a row per product. Row ids are the products'
+    positions in the list.
+    """
+    rows = ["|".join(BATCH_COLUMNS)]
+    for i, product in enumerate(products):
+        competitors = product["competitor_data"] or {}
+        rows.append("|".join(_cell(value) for value in (
+            i, product["product_name"], product["category"], product["your_price"],
+            product["cost"], product["margin"], product["units_sold"],
+            product["elasticity_label"], product["goal"],
+            competitors.get("avg_competitor_price"), competitors.get("lowest_competitor"),
+            competitors.get("highest_competitor"), competitors.get("price_gap_percent"),
+        )))
+    return BATCH_INSTRUCTIONS + "\nProducts:\n" + "\n".join(rows) + "\n"
+
+
+def build_batch_request(products, model=MODEL):
+    """
+    Chat completion arguments for build_batch_prompt with a JSON schema answer.
+    """
+    request = build_request(build_batch_prompt(products), model)
+    request["max_tokens"] = BATCH_TOKENS_PER_PRODUCT * len(products)
+    request["response_format"] = BATCH_RESPONSE_FORMAT
+    return request
+
+
+def parse_batch_response(text, products):
+    """
+    Checks a batched answer against the products it was asked about.
+    Returns {position: record} for every well-formed recommendation; products
+    that are missing, duplicated or malformed are left out. Records have the
+    same keys as optimizer.recommend_price (minus confidence), so
+    format_price_recommendation can turn them into text.
+    """
+    from engine.elasticity import get_margin
+
+    try:
+        items = json.loads(text or "")["recommendations"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    records = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        position = str(item.get("id", ""))
+        if not position.isdigit() or int(position) >= len(products) or int(position) in records:
+            continue
+        product = products[int(position)]
+        record = _batch_record(item, product)
+        if record is not None:
+            record["margin"] = get_margin(record["suggested_price"], product["cost"])
+            records[int(position)] = record
+    return records
+
+
+async def get_batch_recommendations_async(products, batch_size=BATCH_SIZE, concurrency=4,
+                                          timeout=120, max_attempts=4, max_rounds=3):
+    """
+    Like get_recommendations_async, but sends batch_size products per request.
+    Products the model skipped or answered badly are re-queued into new
+    batches for up to max_rounds rounds. With a router, each batch holds
+    products of one route and goes to that route's model. Returns one
+    {"recommendation": record, "error": ...} dict per product, in order,
+    with records as described in parse_batch_response.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    records = [None] * len(products)
+    errors = ["no valid answer from the model"] * len(products)
+
+    routes = [_route(product) for product in products]
+
+    async def run_batch(indexes):
+        batch = [products[i] for i in indexes]
+        route, model, _ = routes[indexes[0]]
+        try:
+            with metrics.span("build_prompt"):
+                request = build_batch_request(batch, model)
+            response = await _complete_async(request, semaphore, timeout, max_attempts, route)
+        except Exception as error:
+            for i in indexes:
+                errors[i] = f"{type(error).__name__}: {error}"
+            return
+        for position, record in parse_batch_response(response.choices[0].message.content, batch).items():
+            records[indexes[position]] = record
+
+    pending = list(range(len(products)))
+    async with _async_client_session():
+        for round_number in range(max_rounds):
+            if not pending:
+                break
+            if round_number:
+                metrics.increment("batch_requeued", len(pending))
+            groups = {}
+            for i in pending:
+                groups.setdefault(routes[i][0], []).append(i)
+            await asyncio.gather(*(
+                run_batch(group[start:start + batch_size])
+                for group in groups.values()
+                for start in range(0, len(group), batch_size)
+            ))
+            pending = [i for i in pending if records[i] is None]
+
+    return [
+        {"recommendation": record, "error": None if record is not None else errors[i]}
+        for i, record in enumerate(records)
+    ]
+
+
+def _batch_record(item, product):
+    action = item.get("action")
+    prices = [item.get(key) for key in ("suggested_price", "price_low", "price_high")]
+    reason, risk = item.get("reason"), item.get("risk")
+
+    if action not in BATCH_ACTIONS:
+        return None
+    if not all(isinstance(p, (int, float)) and not isinstance(p, bool) and p > 0 for p in prices):
+        return None
+    suggested, low, high = (round(float(p), 2) for p in prices)
+    if not low <= suggested <= high:
+        return None
+    if action == "raise" and suggested <= product["your_price"]:
+        return None
+    if action == "lower" and suggested >= product["your_price"]:
+        return None
+    if not (isinstance(reason, str) and reason.strip() and isinstance(risk, str) and risk.strip()):
+        return None
+    return {
+        "action": action,
+        "suggested_price": suggested,
+        "price_range": (low, high),
+        "reason": reason.strip(),
+        "risk": risk.strip(),
+    }
+
 
-    return response.choices[0].message.content
+def _cell(value):
+    if value is None or value != value:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return " ".join(str(value).replace("|", "/").split())
@@ -0,0 +1,96 @@
+# engine/routing.py
+# Sends easy pricing cases to a small, fast model and ambiguous ones to a large one
+
+import threading
+
+from engine.metrics import metrics
+
+# Points each ambiguity signal adds to a case's difficulty score.
+DEFAULT_WEIGHTS = {
+    "unknown_elasticity": 2.0,   # no demand estimate to reason from
+    "unit_elastic": 1.0,         # raising and lowering earn about the same
+    "no_competitors": 1.0,
+    "at_market": 1.0,            # within 10% of the average: no obvious direction
+    "wide_spread": 1.0,          # competitors disagree on the price
+    "conflicting": 1.0,          # demand and market position point opposite ways
+    "thin_margin": 1.0,          # little room to cut, and a missing margin counts too
+    "no_sales": 1.0,             # nothing sold to judge demand by
+}
+WIDE_SPREAD = 0.5    # highest minus lowest competitor, as a share of their average
+THIN_MARGIN = 15.0   # percent
+
+
+class ModelRouter:
+    """
+    Scores how hard a pricing case is from signals the engine has already
+    computed (elasticity label, competitor spread and position, margin,
+    missing data) and picks a route: cases scoring below `threshold` go to
+    routes["fast"], everything else to routes["full"]. Each route is a dict
+    with the "model" and "max_tokens" to call it with. Weights missing from
+    `weights` come from DEFAULT_WEIGHTS; a weight of 0 ignores that signal.
+    """
+
+    def __init__(self, routes, weights=None, threshold=2.0):
+        missing = {"fast", "full"} - set(routes)
+        if missing:
+            raise ValueError(f"Missing routes: {', '.join(sorted(missing))}")
+        self.routes = routes
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.threshold = threshold
+        self.stats = {name: 0 for name in routes}
+        self._lock = threading.Lock()
+
+    def signals(self, product):
+        """
+        Names of the ambiguity signals a product (get_recommendation's arguments) shows.
+        """
+        found = []
+        label = product["elasticity_label"]
+        if label == "unknown":
+            found.append("unknown_elasticity")
+        elif label == "unit elastic":
+            found.append("unit_elastic")
+
+        competitors = product["competitor_data"]
+        if not competitors:
+            found.append("no_competitors")
+        else:
+            position = competitors["position"]
+            if position == "priced at market":
+                found.append("at_market")
+            average = competitors["avg_competitor_price"]
+            spread = competitors["highest_competitor"] - competitors["lowest_competitor"]
+            if average and spread / average > WIDE_SPREAD:
+                found.append("wide_spread")
+            if (label == "inelastic" and position == "priced above market") or \
+                    (label in ("elastic", "highly elastic") and position == "priced below market"):
+                found.append("conflicting")
+
+        margin = product["margin"]
+        if margin is None or margin < THIN_MARGIN:
+            found.append("thin_margin")
+        if not product["units_sold"]:
+            found.append("no_sales")
+        return found
+
+    def score(self, product):
+        return sum(self.weights.get(signal, 0.0) for signal in self.signals(product))
+
+    def route(self, product):
+        """
+        Returns (route name, route settings) for a product.
+        """
+        name = "fast" if self.score(product) < self.threshold else "full"
+        with self._lock:
+            self.stats[name] += 1
+        metrics.increment(f"route_{name}")
+        return name, self.routes[name]
+
+    def report(self):
+        with self._lock:
+            total = sum(self.stats.values())
+            return {
+                **self.stats,
+                "fast_share": round(self.stats["fast"] / total, 4) if total else 0.0,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,105 @@
+# engine/transport.py
+# Tuned httpx connection pools shared by the OpenAI clients
+
+import os
+
+# Every setting can also come from the environment, e.g. PRICING_HTTP_MAX_CONNECTIONS=128.
+DEFAULT_HTTP_SETTINGS = {
+    "max_connections": 64,             # open connections per pool, busy or idle
+    "max_keepalive_connections": 32,   # idle connections kept for reuse
+    "keepalive_expiry": 60.0,          # seconds an idle connection is kept
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,
+    "write_timeout": 10.0,
+    "pool_timeout": 30.0,              # seconds to wait for a free connection
+    "http2": False,                    # needs the h2 package (pip install httpx[http2])
+}
+
+http_settings = {
+    key: type(default)(os.getenv(f"PRICING_HTTP_{key.upper()}", default))
+    if not isinstance(default, bool)
+    else os.getenv(f"PRICING_HTTP_{key.upper()}", str(default)).lower() in ("1", "true", "yes")
+    for key, default in DEFAULT_HTTP_SETTINGS.items()
+}
+
+
+def configure_http(**settings):
+    """
+    Updates http_settings. Clients built afterwards use the new values.
+    """
+    unknown = set(settings) - set(DEFAULT_HTTP_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown HTTP settings: {', '.join(sorted(unknown))}")
+    http_settings.update(settings)
+
+
+def http_timeout():
+    import httpx
+
+    return httpx.Timeout(
+        connect=http_settings["connect_timeout"],
+        read=http_settings["read_timeout"],
+        write=http_settings["write_timeout"],
+        pool=http_settings["pool_timeout"],
+    )
+
+
+def build_http_client(on_response=None):
+    """
+    httpx.Client with the configured pool. It is thread-safe: build one per
+    process and share it, so threads reuse warm keep-alive connections
+    instead of each paying for a new TCP + TLS handshake.
+    on_response(response) is called with every response once its headers arrive.
+    """
+    import httpx
+
+    hooks = {"response": [on_response]} if on_response else {}
+    return httpx.Client(limits=_limits(), timeout=http_timeout(), http2=http_settings["http2"],
+                        event_hooks=hooks)
+
+
+def build_async_http_client(on_response=None):
+    """
+    httpx.AsyncClient with the configured pool. Its connections belong to
+    the event loop that first uses it, so share it within one loop only.
+    """
+    import httpx
+
+    hooks = {}
+    if on_response:
+        async def hook(response):
+            on_response(response)
+        hooks = {"response": [hook]}
+    return httpx.AsyncClient(limits=_limits(), timeout=http_timeout(), http2=http_settings["http2"],
+                             event_hooks=hooks)
+
+
+def pool_stats(http_client):
+    """
+    Connection counts for an httpx client's pool:
+    {"connections", "active", "idle", "max_connections", "utilization"},
+    where utilization is active / max_connections.
+    """
+    # httpx has no public pool API; read httpcore's pool behind the default transport.
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    active = len(connections) - idle
+    limit = getattr(pool, "_max_connections", None) or http_settings["max_connections"]
+    return {
+        "connections": len(connections),
+        "active": active,
+        "idle": idle,
+        "max_connections": limit,
+        "utilization": round(active / limit, 3),
+    }
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=http_settings["max_connections"],
+        max_keepalive_connections=http_settings["max_keepalive_connections"],
+        keepalive_expiry=http_settings["keepalive_expiry"],
+    )
@@ -0,0 +1,55 @@
+import contextlib
+
+import pytest
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from engine import recommender
+from engine.cache import RecommendationCache
+
+PRODUCT = {
+    "product_name": "Beeswax Candle",
+    "category": "Home",
+    "your_price": 20.0,
+    "cost": 8.0,
+    "units_sold": 120,
+    "elasticity_label": "elastic",
+    "margin": 60.0,
+    "competitor_data": None,
+    "goal": "Maximize Profit",
+}
+
+
+@pytest.fixture
+def product():
+    return dict(PRODUCT)
+
+
+@pytest.fixture
+def start_fake_llm(monkeypatch):
+    """
+    start_fake_llm(**settings) starts a FakeLLMServer and points the
+    recommender at it, with a memory-only cache and no similarity cache,
+    router, limiter or hedger. Servers stop when the test ends.
+    """
+    servers = contextlib.ExitStack()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(recommender, "recommendation_cache", RecommendationCache(path=""))
+    monkeypatch.setattr(recommender, "similarity_cache", None)
+    monkeypatch.setattr(recommender, "router", None)
+    monkeypatch.setattr(recommender, "rate_limiter", None)
+    monkeypatch.setattr(recommender, "hedger", None)
+
+    def start(**settings):
+        server = servers.enter_context(FakeLLMServer(**settings))
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        recommender.configure_client()
+        return server
+
+    with servers:
+        yield start
+        recommender.configure_client()
+
+
+@pytest.fixture
+def fake_llm(start_fake_llm):
+    return start_fake_llm()
@@ -0,0 +1,107 @@
+import pytest
+
+from engine.cache import RecommendationCache, SimilarityCache, make_cache_key
+from engine.competitor import analyze_competitors
+from engine.recommender import build_prompt
+
+PRODUCT = {
+    "product_name": "Beeswax Candle", "category": "Home", "your_price": 20.0, "cost": 8.0,
+    "units_sold": 120, "elasticity_label": "elastic", "margin": 60.0,
+    "competitor_data": {"avg_competitor_price": 22.0, "lowest_competitor": 18.0,
+                        "highest_competitor": 26.0, "price_gap": -2.0,
+                        "price_gap_percent": -9.09, "position": "priced at market"},
+    "goal": "Maximize Profit",
+}
+
+
+def key(model="gpt-4o", temperature=0.7, **changes):
+    return make_cache_key(**{**PRODUCT, **changes}, model=model, temperature=temperature)
+
+
+@pytest.mark.parametrize("changes", [
+    {"product_name": "  Beeswax   Candle "},
+    {"your_price": 20.001},
+    {"cost": "8"},
+    {"units_sold": 120.0},
+    {"margin": 60.004},
+])
+def test_inputs_with_the_same_prompt_share_a_key(changes):
+    assert key(**changes) == key()
+    assert build_prompt(**{**PRODUCT, **changes}) == build_prompt(**PRODUCT)
+
+
+@pytest.mark.parametrize("changes", [
+    {"product_name": "Soy Candle"},
+    {"your_price": 20.01},
+    {"goal": "Increase Sales Volume"},
+    {"competitor_data": None},
+    {"competitor_data": {**PRODUCT["competitor_data"], "position": "priced below market"}},
+    {"model": "gpt-4o-mini"},
+    {"temperature": 0.2},
+])
+def test_anything_that_changes_the_answer_changes_the_key(changes):
+    assert key(**changes) != key()
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache" / "recommendations.db")
+    RecommendationCache(path=path).set("k", "answer")
+
+    cache = RecommendationCache(path=path)
+    assert cache.get("k") == "answer"
+    assert cache.get("k") == "answer"
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 0, "errors": 0}
+
+
+def test_expired_disk_entries_miss(tmp_path):
+    path = str(tmp_path / "recommendations.db")
+    RecommendationCache(path=path).set("k", "answer")
+    assert RecommendationCache(path=path, ttl=0).get("k") is None
+
+
+def test_disk_errors_fall_back_to_memory(tmp_path):
+    path = str(tmp_path / "recommendations.db")
+    cache = RecommendationCache(path=path)
+    cache.set("k", "answer")
+    cache._db.close()    # any further disk access raises sqlite3.ProgrammingError
+
+    cache.set("k2", "other")
+    assert cache.get("k2") == "other"
+    assert cache.get("missing") is None
+    assert cache.stats["errors"] == 2
+
+
+def similar(price, competitor_prices, name="Beeswax Candle"):
+    return {
+        "product_name": name, "category": "Home", "your_price": price, "cost": 8.0,
+        "units_sold": 120, "elasticity_label": "elastic", "margin": round((price - 8) / price * 100, 2),
+        "competitor_data": analyze_competitors(price, competitor_prices), "goal": "Maximize Profit",
+    }
+
+
+def answer(product):
+    competitors = product["competitor_data"]
+    side = "below" if competitors["price_gap"] < 0 else "above"
+    return (f"{product['product_name']} at ${product['your_price']:.2f} is "
+            f"{abs(competitors['price_gap_percent']):g}% {side} the ${competitors['avg_competitor_price']:.2f} "
+            f"average with a {product['margin']:g}% margin. Try ${product['your_price'] * 1.05:.2f}.")
+
+
+def test_similarity_template_round_trip():
+    cache = SimilarityCache()
+    cached, asking = similar(19.60, [20.10]), similar(19.70, [20.30], name="Beeswax Candle XL")
+    cache.set(cached, "gpt-4o", 0.7, answer(cached))
+
+    assert cache.get(asking, "gpt-4o", 0.7) == answer(asking)
+
+
+def test_similarity_cache_keeps_the_side_of_the_market():
+    # Both are "priced at market", one 2.49% below the average, the other 1.52% above.
+    cache = SimilarityCache()
+    below, above = similar(19.60, [20.10]), similar(20.00, [19.70])
+    cache.set(below, "gpt-4o", 0.7, answer(below))
+
+    assert cache.get(above, "gpt-4o", 0.7) is None
+    cache.set(above, "gpt-4o", 0.7, answer(above))
+    assert cache.get(above, "gpt-4o", 0.7) == answer(above)
+    assert cache.get(below, "gpt-4o", 0.7) == answer(below)
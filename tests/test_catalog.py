@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+
+from engine.__main__ import main
+from engine.catalog import analyze_catalog_chunk, count_rows, read_catalog, write_chunk
+
+HEADER = "sku,product_name,your_price,cost,units_sold,competitor_prices\n"
+
+
+def analyze(path):
+    return pd.concat([analyze_catalog_chunk(chunk) for chunk in read_catalog(str(path))])
+
+
+def test_single_competitor_prices_read_as_numbers(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(HEADER + "a,Candle,20,8,100,19.5\nb,Soap,12,4,50,14\n")
+
+    result = analyze(path).set_index("sku")
+
+    assert result.loc["a", "avg_competitor_price"] == 19.5
+    assert result.loc["b", "avg_competitor_price"] == 14.0
+    assert result["competitor_count"].tolist() == [1, 1]
+
+
+def test_csv_commas_group_thousands(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(HEADER + 'a,Sofa,1299,600,5,"1,299.00;1,350.00"\nb,Chair,90,40,20,85; 95 ;\n')
+
+    result = analyze(path).set_index("sku")
+
+    assert result.loc["a", "competitor_count"] == 2
+    assert (result.loc["a", "lowest_competitor"], result.loc["a", "highest_competitor"]) == (1299.0, 1350.0)
+    assert result.loc["b", "avg_competitor_price"] == 90.0
+
+
+def test_jsonl_prices_can_be_a_bare_number_or_a_list(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    rows = [{"sku": 1, "your_price": 20, "competitor_prices": 18},
+            {"sku": 2, "your_price": 20, "competitor_prices": [18, 22, 0]},
+            {"sku": 3, "your_price": 20, "competitor_prices": None}]
+    path.write_text("\n".join(json.dumps(row) for row in rows))
+
+    assert analyze(path)["competitor_count"].tolist() == [1, 2, 0]
+
+
+def test_cli_scores_single_price_rows(tmp_path):
+    catalog, output = tmp_path / "catalog.csv", tmp_path / "scored.csv"
+    catalog.write_text(HEADER + "a,Candle,20,8,100,19.5\nb,Soap,12,4,50,14\n")
+
+    main([str(catalog), str(output), "--quiet"])
+
+    assert pd.read_csv(output)["avg_competitor_price"].tolist() == [19.5, 14.0]
+
+
+def test_count_rows_counts_csv_records_not_lines(tmp_path):
+    path = tmp_path / "out.csv"
+    result = pd.DataFrame({"sku": [1, 2, 3], "recommendation": ["one\nline", "two\n\nlines", "three"]})
+    write_chunk(result, str(path), append=False)
+    write_chunk(result, str(path), append=True)
+
+    assert count_rows(str(path)) == 6
+    assert count_rows(str(tmp_path / "missing.csv")) == 0
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine import recommender
+from engine.coalesce import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: flight.do("key", fn), range(8)))
+
+    assert results == ["answer"] * 8
+    assert len(calls) == 1
+    assert flight.stats == {"calls": 1, "collapsed": 7}
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fn():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "key", fn)
+        started.wait()
+        waiter = pool.submit(flight.do, "key", lambda: "unused")
+        for future in (leader, waiter):
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+
+def test_waiter_takes_over_when_the_leader_goes_away():
+    flight = SingleFlight()
+    future, leader = flight.begin("key")
+    assert leader
+
+    with ThreadPoolExecutor(1) as pool:
+        waiter = pool.submit(flight.do, "key", lambda: "retried")
+        time.sleep(0.05)
+        flight.finish("key", future, error=GeneratorExit())    # e.g. a closed stream
+        assert waiter.result(timeout=1) == "retried"
+    assert flight.stats["calls"] == 2
+
+
+def test_async_waiters_share_one_call_and_survive_a_cancelled_waiter():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        tasks = [asyncio.ensure_future(flight.do("key", make_call)) for _ in range(5)]
+        await asyncio.sleep(0.02)
+        tasks[0].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["answer"] * 4
+    assert len(calls) == 1
+
+
+def test_identical_recommendations_make_one_request(fake_llm, product):
+    fake_llm.latency = 0.2
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda _: recommender.get_recommendation(**product), range(6)))
+
+    assert len(set(results)) == 1
+    assert fake_llm.requests == 1
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.competitor import (
+    CompetitorFeed, CompetitorStats, PriceSketch, analyze_competitors, analyze_competitors_batch,
+)
+
+FIELDS = ("avg_competitor_price", "lowest_competitor", "highest_competitor",
+          "price_gap", "price_gap_percent", "position")
+
+
+def test_batch_matches_scalar_per_sku():
+    rng = np.random.default_rng(0)
+    your_prices = np.round(rng.uniform(5, 100, 300), 2)
+    counts = rng.integers(1, 12, 300)
+    rows = [
+        (sku, your_prices[sku], price)
+        for sku in range(300)
+        for price in np.round(your_prices[sku] * rng.uniform(0.6, 1.4, counts[sku]), 2).tolist()
+    ]
+    table = pd.DataFrame(rows, columns=["sku", "our_price", "competitor_price"]).sample(frac=1, random_state=0)
+
+    result = analyze_competitors_batch(table).set_index("sku")
+
+    for sku in range(300):
+        prices = table.loc[table["sku"] == sku, "competitor_price"].tolist()
+        expected = analyze_competitors(float(your_prices[sku]), prices)
+        row = result.loc[sku]
+        assert {field: row[field] for field in FIELDS} == expected
+        assert row["competitor_count"] == len(prices)
+
+
+def test_batch_ignores_missing_sku_and_price_rows():
+    table = pd.DataFrame({
+        "sku": ["a", "a", None, "b", "b"],
+        "our_price": [10.0, 10.0, 10.0, 20.0, 20.0],
+        "competitor_price": [9.0, 11.0, 500.0, np.nan, 30.0],
+    })
+    result = analyze_competitors_batch(table).set_index("sku")
+
+    assert sorted(result.index) == ["a", "b"]
+    assert result.loc["a", "avg_competitor_price"] == 10.0
+    assert result.loc["b", "competitor_count"] == 1
+    assert result.loc["b", "position"] == "priced below market"
+
+
+def test_batch_reads_arrow_tables():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"sku": [1, 1], "our_price": [10.0, 10.0], "competitor_price": [12.0, 14.0]})
+    row = analyze_competitors_batch(table).iloc[0]
+    assert (row["avg_competitor_price"], row["price_gap_percent"]) == (13.0, -23.08)
+
+
+def test_competitor_stats_replace_and_remove_track_current_quotes():
+    stats = CompetitorStats()
+    rng = np.random.default_rng(1)
+    live = {}
+    for step in range(2000):
+        competitor = int(rng.integers(0, 20))
+        if rng.random() < 0.2:
+            stats.remove(competitor)
+            live.pop(competitor, None)
+        else:
+            price = round(float(rng.uniform(5, 50)), 2)
+            stats.update(competitor, price)
+            live[competitor] = price
+
+        assert stats.count == len(live)
+        if live:
+            assert stats.lowest == min(live.values())
+            assert stats.highest == max(live.values())
+            assert stats.mean == pytest.approx(np.mean(list(live.values())))
+            assert stats.variance == pytest.approx(np.var(list(live.values())), abs=1e-6)
+
+
+def test_competitor_stats_analyze_matches_scalar():
+    stats = CompetitorStats()
+    stats.update("a", 18.0)
+    stats.update("b", 25.0)
+    stats.update("a", 22.0)    # replaces a's first quote
+    stats.update("c", 30.0)
+    stats.remove("c")
+    assert stats.analyze(20.0) == analyze_competitors(20.0, [22.0, 25.0])
+
+    stats.remove("a")
+    stats.remove("b")
+    assert stats.analyze(20.0) is None
+    stats.update("d", 10.0)
+    assert (stats.lowest, stats.highest, stats.mean) == (10.0, 10.0, 10.0)
+
+
+def test_feed_keeps_skus_apart():
+    feed = CompetitorFeed()
+    feed.update("x", "a", 10.0)
+    feed.update("y", "a", 50.0)
+    feed.remove("x", "missing")
+    assert feed.analyze("x", 10.0)["avg_competitor_price"] == 10.0
+    assert feed.analyze("y", 10.0)["position"] == "priced below market"
+    assert feed.analyze("z", 10.0) is None
+
+
+def sketch_of(prices, seed=0, k=128):
+    sketch = PriceSketch(k)
+    sketch._random.seed(seed)
+    sketch.update_many(prices)
+    return sketch
+
+
+def test_sketch_stays_small_and_close_to_exact_quantiles():
+    prices = np.random.default_rng(2).lognormal(3, 0.5, 50_000)
+    sketch = sketch_of(prices.tolist())
+
+    assert sketch.n == 50_000
+    assert sum(len(level) for level in sketch.levels) <= 3 * sketch.k
+    for q in (0.1, 0.5, 0.9):
+        assert np.mean(prices <= sketch.quantile(q)) == pytest.approx(q, abs=0.02)
+    assert sketch.rank(float(np.median(prices))) == pytest.approx(0.5, abs=0.02)
+
+
+def test_merged_shards_match_one_sketch():
+    prices = np.random.default_rng(3).uniform(10, 90, 40_000)
+    shards = [sketch_of(part.tolist(), seed=i) for i, part in enumerate(np.array_split(prices, 4))]
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged.merge(shard)
+
+    assert merged.n == 40_000
+    assert sum(len(level) for level in merged.levels) <= 3 * merged.k
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        assert np.mean(prices <= merged.quantile(q)) == pytest.approx(q, abs=0.02)
+
+
+def test_sketch_bytes_round_trip():
+    sketch = sketch_of(np.random.default_rng(4).uniform(1, 100, 5000).tolist())
+    copy = PriceSketch.from_bytes(sketch.to_bytes())
+
+    assert (copy.k, copy.n, copy.levels) == (sketch.k, sketch.n, sketch.levels)
+    assert copy.summary(50.0) == sketch.summary(50.0)
+    copy.update(1.0)    # still a working sketch
+    assert copy.n == sketch.n + 1
+
+
+def test_empty_sketch():
+    sketch = PriceSketch()
+    assert (sketch.quantile(0.5), sketch.rank(1.0), sketch.summary(1.0)) == (None, None, None)
+    assert PriceSketch.from_bytes(sketch.to_bytes()).n == 0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from engine import elasticity
+from engine.elasticity import (
+    ELASTICITY_LABELS, calculate_elasticity, calculate_elasticity_batch, get_margin,
+    get_margin_batch, interpret_elasticity, interpret_elasticity_batch, score_elasticity_batch,
+)
+
+
+def scalar_elasticity(old_prices, new_prices, old_units, new_units):
+    values = [calculate_elasticity(*row) for row in zip(old_prices, new_prices, old_units, new_units)]
+    return np.array([np.nan if value is None else value for value in values])
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Several blocks per test array, so block edges get exercised too.
+    monkeypatch.setattr(elasticity, "BLOCK_ROWS", 1000)
+
+
+def test_batch_matches_scalar_on_random_catalog():
+    rng = np.random.default_rng(0)
+    size = 5000
+    old_prices = np.round(rng.uniform(0, 50, size), 2)
+    old_prices[::17] = 0
+    new_prices = np.where(rng.random(size) < 0.3, old_prices, np.round(rng.uniform(1, 50, size), 2))
+    old_units = rng.integers(0, 300, size).astype(float)
+    new_units = rng.integers(0, 300, size).astype(float)
+    costs = np.round(new_prices * rng.uniform(0, 1.2, size), 2)
+
+    expected = scalar_elasticity(old_prices, new_prices, old_units, new_units)
+    batch, codes, margin = score_elasticity_batch(old_prices, new_prices, old_units, new_units, costs)
+
+    np.testing.assert_array_equal(batch, expected)
+    np.testing.assert_array_equal(calculate_elasticity_batch(old_prices, new_prices, old_units, new_units), expected)
+    assert [ELASTICITY_LABELS[code] for code in codes] == [
+        interpret_elasticity(None if np.isnan(value) else value) for value in expected
+    ]
+    np.testing.assert_array_equal(margin, [get_margin(price, cost) for price, cost in zip(new_prices, costs)])
+
+
+def test_half_cent_ties_round_like_python():
+    # At a $100 price the margin is 100 - cost, so 3-decimal costs land on x.xx5 ties.
+    costs = np.arange(0, 100_000, 7) / 1000
+    prices = np.full(len(costs), 100.0)
+    expected = np.array([get_margin(100.0, cost) for cost in costs.tolist()])
+    assert (np.round((prices - costs) / prices * 100, 2) != expected).any()    # np.round alone is off
+    np.testing.assert_array_equal(get_margin_batch(prices, costs), expected)
+
+
+def test_labels_match_scalar_at_the_thresholds():
+    values = np.array([np.nan, 0, 0.99, 1, -1, 1.01, 2, -2, 2.01, np.inf, -np.inf])
+    expected = ["unknown", "inelastic", "inelastic", "unit elastic", "unit elastic", "elastic",
+                "elastic", "elastic", "highly elastic", "highly elastic", "highly elastic"]
+    assert [ELASTICITY_LABELS[code] for code in interpret_elasticity_batch(values)] == expected
+    assert interpret_elasticity_batch(values.reshape(1, -1)).shape == (1, len(values))
+
+
+def test_zero_price_margin_is_zero():
+    np.testing.assert_array_equal(get_margin_batch([0.0, 10.0], [5.0, 4.0]), [0.0, 60.0])
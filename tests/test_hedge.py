@@ -0,0 +1,89 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine.hedge import Hedger
+
+
+def warmed_up(**settings):
+    hedger = Hedger(min_samples=5, min_delay=0.01, **settings)
+    for _ in range(5):
+        hedger.record(0.02)
+    return hedger
+
+
+def test_no_hedging_before_min_samples():
+    hedger = Hedger(min_samples=5)
+    for _ in range(4):
+        hedger.record(0.02)
+    assert hedger.delay() is None
+    hedger.record(0.02)
+    assert hedger.delay() == 0.05    # min_delay floor
+
+
+def test_slow_async_call_is_hedged_and_the_hedge_wins():
+    hedger = warmed_up(max_extra=1.0)
+    attempts = []
+
+    async def make_call():
+        attempts.append(1)
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.01)
+        return len(attempts)
+
+    started = time.perf_counter()
+    assert asyncio.run(hedger.run_async(make_call)) == 2
+    assert time.perf_counter() - started < 0.5
+    assert hedger.stats["hedged"] == hedger.stats["hedge_won"] == 1
+
+
+def test_hedges_stay_within_budget():
+    hedger = warmed_up(max_extra=0.0)
+
+    async def make_call():
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    assert asyncio.run(hedger.run_async(make_call)) == "slow"
+    assert hedger.stats["hedged"] == 0
+    assert hedger.stats["over_budget"] == 1
+
+
+def test_threaded_calls_are_hedged():
+    hedger = warmed_up(max_extra=1.0)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        time.sleep(0.5 if len(attempts) == 1 else 0.01)
+        return len(attempts)
+
+    assert hedger.run(fn) == 2
+    assert hedger.stats["hedge_won"] == 1
+
+
+@pytest.mark.parametrize("max_extra, recent_latency", [(0.0, 0.2), (1.0, 0.5)])
+def test_threaded_callers_do_not_queue_behind_each_other(max_extra, recent_latency):
+    # 48 concurrent callers, more than any fixed pool would hold.
+    hedger = Hedger(max_extra=max_extra, min_samples=5)
+    for _ in range(5):
+        hedger.record(recent_latency)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(48) as pool:
+        list(pool.map(lambda _: hedger.run(lambda: time.sleep(0.2)), range(48)))
+
+    assert time.perf_counter() - started < 0.4
+    assert hedger.stats["hedged"] == 0    # no call ran past the learned p95
+    assert max(list(hedger.latencies)[5:]) < 0.35    # queue time would count as latency
+
+
+def test_threaded_errors_reach_the_caller():
+    hedger = warmed_up(max_extra=1.0)
+
+    def fn():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        hedger.run(fn)
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.jobs import JobQueue, main, run_worker
+
+
+def make_queue(tmp_path, **settings):
+    return JobQueue(str(tmp_path / "jobs.db"), **settings)
+
+
+def test_concurrent_workers_never_share_a_job(tmp_path):
+    make_queue(tmp_path).enqueue([{"n": i} for i in range(200)])
+    leased = []
+
+    def work():
+        queue = make_queue(tmp_path)    # own connection, like a separate process
+        while True:
+            jobs = queue.lease(threading.current_thread().name, limit=7)
+            if not jobs:
+                return
+            leased.extend(job_id for job_id, _ in jobs)
+            for job_id, product in jobs:
+                queue.complete(job_id, threading.current_thread().name, product)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(leased) == list(range(1, 201))
+    assert make_queue(tmp_path).counts()["done"] == 200
+
+
+def test_expired_lease_goes_to_another_worker(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.05)
+    queue.enqueue([{"n": 1}])
+    [(job_id, _)] = queue.lease("a")
+    assert queue.lease("b") == []
+
+    time.sleep(0.1)
+    assert [job for job, _ in queue.lease("b")] == [job_id]
+    assert not queue.complete(job_id, "a", "late")    # "a" lost the lease
+    assert queue.complete(job_id, "b", "ok")
+
+
+def test_extend_keeps_the_lease(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.1)
+    queue.enqueue([{"n": 1}])
+    [(job_id, _)] = queue.lease("a")
+    for _ in range(3):
+        time.sleep(0.05)
+        assert queue.extend(job_id, "a")
+    assert queue.lease("b") == []
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.01, max_attempts=2)
+    queue.enqueue([{"n": 1}])
+    for worker in ("a", "b"):
+        assert queue.lease(worker)
+        time.sleep(0.02)
+    assert queue.lease("c") == []
+    assert queue.counts()["failed"] == 1
+
+
+def test_paused_run_leases_nothing(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue([{"n": 1}], run="spring")
+    queue.pause("spring")
+    assert queue.lease("a", run="spring") == []
+    queue.resume("spring")
+    assert len(queue.lease("a", run="spring")) == 1
+
+
+def test_slow_batches_are_not_paid_for_twice(tmp_path, start_fake_llm, product):
+    # Each answer takes longer than the lease; the heartbeat must keep it.
+    server = start_fake_llm(latency=0.5)
+    make_queue(tmp_path).enqueue([dict(product, your_price=20.0 + i) for i in range(8)])
+
+    done = []
+    workers = [
+        threading.Thread(target=lambda: done.append(run_worker(
+            make_queue(tmp_path, visibility_timeout=0.3), lease_size=4, poll=0.05
+        )))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(done) == 8
+    assert server.requests == 8
+
+
+def test_payloads_take_numpy_scalars_and_reject_other_objects(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue([{"price": np.float64(9.5), "units": np.int64(3)}])
+    assert queue.lease("a")[0][1] == {"price": 9.5, "units": 3}
+
+    with pytest.raises(TypeError, match="Timestamp"):
+        queue.enqueue([{"seen": pd.Timestamp("2026-01-01")}])
+
+
+@pytest.mark.parametrize("command", ["enqueue", "export"])
+def test_cli_asks_for_a_path(tmp_path, command, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main([command, "--queue", str(tmp_path / "jobs.db")])
+    assert exit_info.value.code == 2
+    assert f"{command} needs a path" in capsys.readouterr().err
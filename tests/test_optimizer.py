@@ -0,0 +1,72 @@
+import pytest
+
+from engine.competitor import analyze_competitors
+from engine.optimizer import (
+    GOALS, MIN_CONFIDENCE, MIN_MARGIN, PROTECTED_MARGIN, format_price_recommendation, recommend_price,
+)
+
+MARKET = analyze_competitors(20.0, [18.0, 21.0, 24.0])
+
+
+def test_profit_uses_the_markup_rule():
+    # e = -3: p* = cost * e / (1 + e) = 1.5 * cost
+    result = recommend_price(20.0, 12.0, -3.0, MARKET, "Maximize Profit")
+    assert (result["action"], result["suggested_price"]) == ("lower", 18.0)
+    assert result["confidence"] >= MIN_CONFIDENCE
+    assert result["price_range"] == (17.46, 18.54)
+
+
+def test_inelastic_demand_raises_up_to_the_highest_competitor():
+    result = recommend_price(20.0, 8.0, -0.5, MARKET, "Maximize Profit")
+    assert (result["action"], result["suggested_price"]) == ("raise", 24.0)
+
+
+def test_sales_volume_matches_the_cheapest_competitor_above_the_margin_floor():
+    result = recommend_price(20.0, 8.0, -1.5, MARKET, "Maximize Sales Volume")
+    assert result["suggested_price"] == 18.0
+
+    floor = recommend_price(20.0, 17.0, -1.5, MARKET, "Maximize Sales Volume")
+    assert floor["suggested_price"] == round(17.0 / (1 - MIN_MARGIN), 2)
+    assert "15% margin" in floor["reason"]
+
+
+def test_beat_competitors_undercuts_but_never_breaks_the_margin_floor():
+    assert recommend_price(20.0, 8.0, -1.5, MARKET, "Beat Competitors")["suggested_price"] == 17.64
+
+    squeezed = recommend_price(20.0, 16.5, -1.5, MARKET, "Beat Competitors")
+    assert squeezed["suggested_price"] == round(16.5 / (1 - MIN_MARGIN), 2)
+    assert squeezed["confidence"] < MIN_CONFIDENCE
+
+
+def test_protecting_margin_sits_at_the_average_or_the_protected_floor():
+    assert recommend_price(20.0, 8.0, -1.5, MARKET, "Stay Competitive While Protecting Margin")[
+        "suggested_price"] == 21.0
+    result = recommend_price(20.0, 18.0, -1.5, MARKET, "Stay Competitive While Protecting Margin")
+    assert result["margin"] >= PROTECTED_MARGIN * 100 - 0.01
+    assert result["confidence"] <= 0.5    # above every competitor
+
+
+@pytest.mark.parametrize("goal", GOALS)
+def test_missing_inputs_lower_confidence(goal):
+    full = recommend_price(20.0, 8.0, -1.5, MARKET, goal)["confidence"]
+    partial = recommend_price(20.0, 8.0, None, MARKET, goal)["confidence"]
+    bare = recommend_price(20.0, 8.0, None, None, goal)["confidence"]
+    assert full >= partial >= bare
+    assert bare < MIN_CONFIDENCE
+
+
+def test_big_moves_are_capped():
+    result = recommend_price(20.0, 4.0, -1.1, None, "Maximize Profit")    # markup rule says $44
+    assert result["suggested_price"] == 25.0
+    assert "capped" in result["reason"]
+
+
+def test_bad_inputs_and_unknown_goals_give_none():
+    assert recommend_price(0, 8.0, -1.5, MARKET, "Maximize Profit") is None
+    assert recommend_price(20.0, 8.0, -1.5, MARKET, "Win") is None
+
+
+def test_format_reads_like_an_answer():
+    text = format_price_recommendation(recommend_price(20.0, 12.0, -3.0, MARKET, "Maximize Profit"))
+    assert text.startswith("Lower your price to $18.00 (a good range is $17.46–$18.54)")
+    assert "Risk to watch:" in text
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from engine import recommender
+from engine.ratelimit import POLL, RateLimiter, _duration, _retry_after, estimate_tokens
+
+
+def test_estimate_tokens_counts_prompt_and_max_tokens():
+    request = {"messages": [{"role": "user", "content": "x" * 10}], "max_tokens": 100}
+    assert estimate_tokens(request) == 3 + 4 + 100
+
+
+def test_rate_limit_halves_concurrency_once_per_burst():
+    limiter = RateLimiter(concurrency=8)
+    limiter.observe(429, {"retry-after-ms": "0"})
+    limiter.observe(429, {"retry-after-ms": "0"})    # same burst, inside the cooldown
+    assert limiter.concurrency == 4
+    assert limiter.stats["decreases"] == 1
+    assert limiter.stats["rate_limited"] == 2
+
+
+def test_successes_raise_concurrency_additively():
+    limiter = RateLimiter(concurrency=4, max_concurrency=5)
+    for _ in range(4):
+        limiter.observe(200, {})
+    assert limiter.concurrency == pytest.approx(5, abs=0.1)
+    for _ in range(20):
+        limiter.observe(200, {})
+    assert limiter.concurrency == 5
+
+
+def test_concurrency_caps_requests_in_flight():
+    limiter = RateLimiter(concurrency=2)
+    assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) == POLL
+    limiter._release()
+    assert limiter._try_acquire(10) == 0
+
+
+def test_empty_request_bucket_returns_the_refill_delay():
+    limiter = RateLimiter(rpm=60, concurrency=100)
+    for _ in range(60):
+        assert limiter._try_acquire(10) == 0
+    assert limiter._try_acquire(10) == pytest.approx(1.0, abs=0.05)
+
+
+def test_429_blocks_admission_for_retry_after():
+    limiter = RateLimiter()
+    limiter.observe(429, {"retry-after": "0.5"})
+    assert limiter._try_acquire(10) == pytest.approx(0.5, abs=0.05)
+
+
+def test_limits_are_learned_from_headers():
+    limiter = RateLimiter()
+    limiter.observe(200, {"x-ratelimit-limit-requests": "500", "x-ratelimit-limit-tokens": "30000",
+                          "x-ratelimit-remaining-tokens": "29000"})
+    report = limiter.report()
+    assert (report["rpm"], report["tpm"]) == (500, 30000)
+    assert report["requests_available"] == pytest.approx(500, abs=1)
+    assert report["tokens_available"] == pytest.approx(29000, abs=10)
+
+
+def test_configured_limits_win_when_lower():
+    limiter = RateLimiter(rpm=100)
+    limiter.observe(200, {"x-ratelimit-limit-requests": "500"})
+    assert limiter.rpm == 100
+
+
+@pytest.mark.parametrize("headers, seconds", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after": "2"}, 2.0),
+    ({"x-ratelimit-reset-requests": "1.5s"}, 1.5),
+    ({"x-ratelimit-reset-tokens": "6m0s"}, 360.0),
+    ({"x-ratelimit-reset-tokens": "20ms"}, 0.02),
+    ({}, 1.0),
+])
+def test_retry_after(headers, seconds):
+    assert _retry_after(headers) == pytest.approx(seconds)
+
+
+def test_duration_adds_units():
+    assert _duration("1h2m3.5s") == pytest.approx(3723.5)
+    assert _duration(None) == 0
+
+
+def test_limiter_learns_the_servers_limits(start_fake_llm, monkeypatch, product):
+    server = start_fake_llm(rpm=600, tpm=200_000)
+    limiter = RateLimiter()
+    monkeypatch.setattr(recommender, "rate_limiter", limiter)
+    products = [dict(product, your_price=20.0 + i) for i in range(12)]
+
+    results = asyncio.run(recommender.get_recommendations_async(products, use_cache=False))
+
+    assert all(result["error"] is None for result in results)
+    assert (limiter.rpm, limiter.tpm) == (600, 200_000)
+    assert limiter.stats["admitted"] == 12
+    assert server.rate_limited == 0
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+
+from engine import recommender
+from engine.metrics import metrics
+
+
+@pytest.fixture
+def quick_retries(monkeypatch):
+    monkeypatch.setattr(recommender, "RETRY_BACKOFF", 0.01)
+
+
+def retries():
+    return metrics.summary()["counters"].get("retries", 0)
+
+
+def test_sync_calls_retry_and_count_each_retry(start_fake_llm, quick_retries, product):
+    from openai import RateLimitError
+
+    server = start_fake_llm(rpm=1)    # the first request spends the minute's budget
+    recommender.get_recommendation(**product)
+    before = retries()
+
+    with pytest.raises(RateLimitError):
+        recommender.get_recommendation(**dict(product, your_price=21.0))
+    assert server.requests == 1 + recommender.MAX_ATTEMPTS
+    assert retries() - before == recommender.MAX_ATTEMPTS - 1
+
+
+def test_streaming_retries_are_counted(start_fake_llm, quick_retries, product):
+    from openai import RateLimitError
+
+    server = start_fake_llm(rpm=1)
+    assert "".join(recommender.stream_recommendation(**product))
+    before = retries()
+
+    with pytest.raises(RateLimitError):
+        "".join(recommender.stream_recommendation(**dict(product, your_price=21.0)))
+    assert server.requests == 1 + recommender.MAX_ATTEMPTS
+    assert retries() - before == recommender.MAX_ATTEMPTS - 1
+
+
+def batch_item(id, **changes):
+    item = {"id": str(id), "action": "raise", "suggested_price": 22.0, "price_low": 21.0,
+            "price_high": 23.0, "reason": " Demand is steady. ", "risk": "Buyers may notice."}
+    return {**item, **changes}
+
+
+def test_batch_response_keeps_well_formed_answers(product):
+    text = json.dumps({"recommendations": [batch_item(0), batch_item(1, action="lower", suggested_price=18.5,
+                                                                      price_low=18, price_high=19)]})
+    records = recommender.parse_batch_response(text, [product, product])
+
+    assert records[0] == {"action": "raise", "suggested_price": 22.0, "price_range": (21.0, 23.0),
+                          "reason": "Demand is steady.", "risk": "Buyers may notice.", "margin": 63.64}
+    assert records[1]["action"] == "lower"
+
+
+@pytest.mark.parametrize("item", [
+    batch_item(5),                                   # no such product
+    batch_item("x"),
+    batch_item(-1),
+    batch_item(0, action="double"),
+    batch_item(0, suggested_price="22"),
+    batch_item(0, suggested_price=True),
+    batch_item(0, price_low=0),
+    batch_item(0, suggested_price=30.0),             # outside its own range
+    batch_item(0, suggested_price=19.0, price_low=18.0),    # "raise" below the current price
+    batch_item(0, action="lower"),                   # "lower" above the current price
+    batch_item(0, reason="  "),
+    batch_item(0, risk=None),
+])
+def test_batch_response_rejects_malformed_answers(item, product):
+    assert recommender.parse_batch_response(json.dumps({"recommendations": [item]}), [product]) == {}
+
+
+@pytest.mark.parametrize("text", [None, "", "not json", "[]", '{"recommendations": {}}', '{"other": []}'])
+def test_batch_response_rejects_malformed_documents(text, product):
+    assert recommender.parse_batch_response(text, [product]) == {}
+
+
+def test_batch_response_keeps_the_first_of_duplicate_ids(product):
+    text = json.dumps({"recommendations": [batch_item(0), batch_item(0, suggested_price=22.5)]})
+    assert recommender.parse_batch_response(text, [product])[0]["suggested_price"] == 22.0
+
+
+def test_batches_answer_every_product(fake_llm, product):
+    products = [dict(product, product_name=f"Candle {i}", your_price=20.0 + i) for i in range(7)]
+
+    results = asyncio.run(recommender.get_batch_recommendations_async(products, batch_size=3))
+
+    assert all(result["error"] is None for result in results)
+    assert all(result["recommendation"]["action"] in recommender.BATCH_ACTIONS for result in results)
+    assert fake_llm.requests == 3
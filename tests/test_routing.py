@@ -0,0 +1,54 @@
+import pytest
+
+from engine.competitor import analyze_competitors
+from engine.routing import ModelRouter
+
+ROUTES = {"fast": {"model": "small", "max_tokens": 250}, "full": {"model": "large", "max_tokens": 400}}
+
+
+def case(your_price=20.0, competitor_prices=(30.0, 31.0), **changes):
+    product = {
+        "product_name": "Beeswax Candle", "category": "Home", "your_price": your_price, "cost": 8.0,
+        "units_sold": 120, "elasticity_label": "elastic", "margin": 60.0,
+        "competitor_data": analyze_competitors(your_price, list(competitor_prices)) if competitor_prices else None,
+        "goal": "Maximize Profit",
+    }
+    return {**product, **changes}
+
+
+@pytest.mark.parametrize("product, signals", [
+    (case(competitor_prices=(15.0, 16.0)), []),                           # elastic, above market
+    (case(), ["conflicting"]),                                            # elastic but already cheap
+    (case(elasticity_label="unknown"), ["unknown_elasticity"]),
+    (case(elasticity_label="unit elastic", competitor_prices=(15.0, 16.0)), ["unit_elastic"]),
+    (case(competitor_prices=None), ["no_competitors"]),
+    (case(competitor_prices=(19.0, 21.0)), ["at_market"]),
+    (case(competitor_prices=(8.0, 22.0), your_price=30.0), ["wide_spread"]),
+    (case(elasticity_label="inelastic", competitor_prices=(15.0, 16.0)), ["conflicting"]),
+    (case(competitor_prices=(15.0, 16.0), margin=10.0), ["thin_margin"]),
+    (case(competitor_prices=(15.0, 16.0), margin=None), ["thin_margin"]),
+    (case(competitor_prices=(15.0, 16.0), units_sold=0), ["no_sales"]),
+])
+def test_signals(product, signals):
+    assert ModelRouter(ROUTES).signals(product) == signals
+
+
+def test_clear_cases_go_fast_and_ambiguous_ones_full():
+    router = ModelRouter(ROUTES)
+    assert router.route(case(competitor_prices=(15.0, 16.0))) == ("fast", ROUTES["fast"])
+    assert router.route(case()) == ("fast", ROUTES["fast"])    # one signal scores 1
+    assert router.route(case(elasticity_label="unknown")) == ("full", ROUTES["full"])
+    assert router.route(case(competitor_prices=None, units_sold=0)) == ("full", ROUTES["full"])
+    assert router.report() == {"fast": 2, "full": 2, "fast_share": 0.5, "threshold": 2.0}
+
+
+def test_weights_and_threshold_change_the_route():
+    product = case(elasticity_label="unknown")
+    assert ModelRouter(ROUTES, weights={"unknown_elasticity": 0}).route(product)[0] == "fast"
+    assert ModelRouter(ROUTES, threshold=3.0).route(product)[0] == "fast"
+    assert ModelRouter(ROUTES, weights={"conflicting": 5}).score(case()) == 5
+
+
+def test_both_routes_are_required():
+    with pytest.raises(ValueError, match="full"):
+        ModelRouter({"fast": ROUTES["fast"]})